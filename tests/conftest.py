@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# trans.py 是单文件脚本，不是可安装的包
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,32 @@
+import openpyxl
+
+from trans import scan_translated_workbook
+
+
+def test_translations_follow_longest_source_column(tmp_path):
+    path = tmp_path / "done.xlsx"
+    wb = openpyxl.Workbook()
+    wb.active.append(["商品", "商品-名称", "商品-英语(EN)", "商品-名称-英语(EN)", "商品-名称-日语(JA)"])
+    wb.active.append(["雨衣", "防水外套", "raincoat", "rain jacket", "レインジャケット"])
+    wb.save(path)
+
+    pairs, skipped = scan_translated_workbook(str(path), "商品")
+    assert pairs == {
+        ("EN", "雨衣", "raincoat"),
+        ("EN", "防水外套", "rain jacket"),
+        ("JA", "防水外套", "レインジャケット"),
+    }
+    assert skipped == 0
+
+
+def test_single_column_results_use_selected_column(tmp_path):
+    path = tmp_path / "done.xlsx"
+    wb = openpyxl.Workbook()
+    wb.active.append(["编号", "中文", "英语(EN)"])
+    wb.active.append(["A", "帽子", "hat"])
+    wb.active.append(["B", "手套", None])
+    wb.save(path)
+
+    pairs, skipped = scan_translated_workbook(str(path), "中文")
+    assert pairs == {("EN", "帽子", "hat")}
+    assert skipped == 1
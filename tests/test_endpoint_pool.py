@@ -0,0 +1,179 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+from aiohttp import web
+
+from trans import EndpointPool, TranslationAPI
+
+
+def make_pool(*concurrency):
+    return EndpointPool([(f"http://127.0.0.1:{9000 + i}/api", "key", c, 0.0) for i, c in enumerate(concurrency)])
+
+
+def occupy(pool, endpoint, count=1):
+    endpoint.outstanding += count
+    pool._released = asyncio.Event()
+
+
+def test_pick_prefers_fewest_outstanding_weighted_by_slowness():
+    pool = make_pool(4, 4)
+    a, b = pool.endpoints
+    assert pool.capacity == 8
+    a.outstanding = 1
+    assert pool._pick() is b
+    b.outstanding = 1
+    b.slowness = 3.0  # (1+1)*1.0 < (1+1)*3.0
+    assert pool._pick() is a
+    a.outstanding = 3  # (3+1)*1.0 < (1+1)*3.0
+    assert pool._pick() is a
+    a.outstanding = 4  # 已满
+    assert pool._pick() is b
+
+
+def test_release_updates_slowness_towards_observed_ratio():
+    pool = make_pool(2)
+    endpoint = pool.endpoints[0]
+    occupy(pool, endpoint)
+    pool.release(endpoint, seconds=3.0, estimate=1.0)
+    assert endpoint.outstanding == 0
+    assert endpoint.slowness == pytest.approx(1.0 + EndpointPool.SLOWNESS_ALPHA * 2.0)
+    assert endpoint.busy_seconds == 3.0
+
+
+def test_consecutive_failures_eject_endpoint(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("trans.time.time", lambda: now[0])
+    pool = make_pool(2, 2)
+    a, b = pool.endpoints
+    for _ in range(EndpointPool.EJECT_FAILURES):
+        occupy(pool, a)
+        pool.release(a, unhealthy=True)
+    assert a.ejected_until == now[0] + EndpointPool.EJECT_SECONDS
+    assert a.ejections == 1
+    b.outstanding = 1
+    assert pool._pick() is b  # 被剔除的接口即使更空闲也不选
+    b.outstanding = 2
+    assert pool._pick() is None  # 健康接口已满时等待，不回到被剔除的接口
+
+    now[0] += EndpointPool.EJECT_SECONDS
+    assert pool._pick() is a  # 剔除到期后重新接纳
+
+
+def test_success_resets_failure_streak():
+    pool = make_pool(1)
+    endpoint = pool.endpoints[0]
+    for unhealthy in (True, True, False, True, True):
+        occupy(pool, endpoint)
+        if unhealthy:
+            pool.release(endpoint, unhealthy=True)
+        else:
+            pool.release(endpoint, seconds=1.0, estimate=1.0)
+    assert endpoint.failures == 4
+    assert endpoint.ejections == 0
+
+
+def test_all_ejected_falls_back_to_earliest_expiry(monkeypatch):
+    monkeypatch.setattr("trans.time.time", lambda: 1000.0)
+    pool = make_pool(1, 1)
+    a, b = pool.endpoints
+    a.ejected_until, b.ejected_until = 1020.0, 1010.0
+    assert pool._pick() is b
+
+
+def test_pick_avoids_failed_endpoint():
+    pool = make_pool(2, 2)
+    a, b = pool.endpoints
+    assert pool._pick(avoid=a) is b
+    b.outstanding = 2
+    assert pool._pick(avoid=a) is None  # 另一健康接口占满时等待
+    b.ejected_until = float("inf")
+    assert pool._pick(avoid=a) is a  # 没有其他健康接口时仍可使用
+
+
+@pytest.fixture
+def status_servers():
+    """两个本地接口：第一个返回指定的错误状态码，第二个正常返回"""
+    status = {"code": 503}
+    hits = [0, 0]
+    ready = threading.Event()
+    state = {"urls": []}
+
+    def handler(i):
+        async def handle(request):
+            data = await request.json()
+            hits[i] += 1
+            if i == 0:
+                return web.json_response({"message": "busy"}, status=status["code"])
+            return web.json_response({"data": {"outputs": {"text": "ok:" + data["inputs"]["query"]}}})
+        return handle
+
+    async def serve():
+        runners = []
+        for i in range(2):
+            app = web.Application()
+            app.router.add_post("/api", handler(i))
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            runners.append(runner)
+            state["urls"].append(f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/api")
+        state["stop"] = asyncio.Event()
+        ready.set()
+        await state["stop"].wait()
+        for runner in runners:
+            await runner.cleanup()
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True)
+    thread.start()
+    ready.wait()
+    yield state["urls"], status, hits
+    loop.call_soon_threadsafe(state["stop"].set)
+    thread.join()
+    loop.close()
+
+
+def make_api(tmp_path, urls):
+    config = SimpleNamespace(
+        fast_path=False, request_compression=False, compress_min_bytes=0, request_timeout_factor=3.0,
+        data_dir=tmp_path, hedge_percentile=95.0, hedge_max_ratio=0.0,
+    )
+    return TranslationAPI(config, endpoints=[(url, "key", 1, 0.0) for url in urls])
+
+
+@pytest.mark.parametrize("code", [429, 503])
+def test_overload_status_fails_over_and_ejects(tmp_path, status_servers, code):
+    urls, status, hits = status_servers
+    status["code"] = code
+    api = make_api(tmp_path, urls)
+    first = api.endpoints.endpoints[0]
+
+    async def run():
+        async with api.new_session() as session:
+            for i in range(EndpointPool.EJECT_FAILURES):
+                first.slowness = 0.1  # 让评分总是优先选第一个接口
+                assert await api.translate(session, f"文本{i}", "zh", "EN") == f"ok:文本{i}"
+
+    asyncio.run(run())
+    assert hits[0] == EndpointPool.EJECT_FAILURES
+    assert first.failures == EndpointPool.EJECT_FAILURES
+    assert first.ejections == 1
+    assert api.metrics['failovers'] == EndpointPool.EJECT_FAILURES
+
+
+def test_client_error_does_not_count_against_endpoint(tmp_path, status_servers):
+    urls, status, hits = status_servers
+    status["code"] = 400
+    api = make_api(tmp_path, urls)
+
+    async def run():
+        async with api.new_session() as session:
+            with pytest.raises(ValueError, match="400"):
+                await api.translate(session, "文本", "zh", "EN")
+
+    asyncio.run(run())
+    assert hits == [1, 0]  # 请求本身有误，不换接口重试
+    assert api.endpoints.endpoints[0].failures == 0
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+
+import openpyxl
+import pytest
+from aiohttp import web
+
+import trans
+from trans import AhoCorasick, GlossaryIndex, TranslationThread
+
+
+def write_glossary(path, rows):
+    path.write_text("中文,英语(EN),日语(JA)\n" + "\n".join(",".join(row) for row in rows) + "\n", encoding="utf-8")
+    return path
+
+
+def test_automaton_reports_overlapping_matches():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    matches = sorted(automaton.find("ushers"))
+    assert matches == [(1, 4, 1), (2, 4, 0), (2, 6, 3)]
+
+
+def test_constraints_take_longest_non_overlapping_terms():
+    index = GlossaryIndex(
+        ["防水", "防水外套", "外套", "拉链"],
+        {"EN": {0: "waterproof", 1: "rain jacket", 2: "jacket", 3: "zipper"}},
+    )
+    assert index.constraints("这款防水外套带拉链", "EN") == [("防水外套", "rain jacket"), ("拉链", "zipper")]
+
+
+def test_constraints_skip_terms_without_translation():
+    index = GlossaryIndex(["防水外套", "防水"], {"EN": {1: "waterproof"}, "JA": {}})
+    # 最长的术语没有英文译文时，退回到较短的术语
+    assert index.constraints("防水外套", "EN") == [("防水", "waterproof")]
+    assert index.constraints("防水外套", "JA") == []
+    assert index.constraints("防水外套", "DE") == []
+
+
+def test_constraints_ignore_case():
+    index = GlossaryIndex(["USB-C"], {"JA": {0: "USB-C端子"}})
+    assert index.constraints("支持 usb-c 充电", "JA") == [("USB-C", "USB-C端子")]
+
+
+def test_build_reads_language_columns(tmp_path):
+    path = write_glossary(tmp_path / "glossary.csv", [("防水", "waterproof", "防水"), ("拉链", "zipper", "")])
+    index = GlossaryIndex.build(path)
+    assert index.terms == ["防水", "拉链"]
+    assert index.lookup(" 拉链 ", "EN") == "zipper"
+    assert index.lookup("拉链", "JA") is None
+
+
+def test_fingerprint_depends_on_content_only():
+    a = GlossaryIndex(["防水"], {"EN": {0: "waterproof"}})
+    b = GlossaryIndex(["防水"], {"EN": {0: "waterproof"}})
+    c = GlossaryIndex(["防水"], {"EN": {0: "water-resistant"}})
+    assert a.fingerprint == b.fingerprint
+    assert a.fingerprint != c.fingerprint
+
+
+def test_load_rebuilds_pickle_when_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(GlossaryIndex, "_loaded", {})
+    path = write_glossary(tmp_path / "glossary.csv", [("防水", "waterproof", "防水")])
+    first = GlossaryIndex.load(path, tmp_path / "cache")
+    assert list((tmp_path / "cache").glob("glossary_*.pkl"))
+
+    # 清空进程内缓存后从磁盘上的预编译索引加载
+    GlossaryIndex._loaded.clear()
+    assert GlossaryIndex.load(path, tmp_path / "cache").fingerprint == first.fingerprint
+
+    write_glossary(path, [("防水", "water-resistant", "防水"), ("拉链", "zipper", "")])
+    GlossaryIndex._loaded.clear()
+    changed = GlossaryIndex.load(path, tmp_path / "cache")
+    assert changed.fingerprint != first.fingerprint
+    assert changed.constraints("防水拉链", "EN") == [("防水", "water-resistant"), ("拉链", "zipper")]
+
+
+@pytest.fixture
+def capture_api():
+    """记录收到的请求，返回 EN: 前缀加原文"""
+    requests = []
+    ready = threading.Event()
+    state = {}
+
+    async def handle(request):
+        data = await request.json()
+        requests.append(data["inputs"])
+        return web.json_response({"data": {"outputs": {"text": "EN:" + data["inputs"]["query"]}}})
+
+    async def serve():
+        app = web.Application()
+        app.router.add_post("/api", handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        state["url"] = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/api"
+        state["stop"] = asyncio.Event()
+        ready.set()
+        await state["stop"].wait()
+        await runner.cleanup()
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True)
+    thread.start()
+    ready.wait()
+    yield state["url"], requests
+    loop.call_soon_threadsafe(state["stop"].set)
+    thread.join()
+    loop.close()
+
+
+def run_job(tmp_path, name, glossary_path=""):
+    params = {
+        'input_path': str(tmp_path / "input.xlsx"),
+        'output_path': str(tmp_path / f"{name}.xlsx"),
+        'source_lang': "zh",
+        'text_column': "中文",
+        'text_columns': ["中文"],
+        'sheets': [],
+        'target_langs': ["EN"],
+        'prefilter': False,
+        'use_cache': True,
+        'glossary_path': glossary_path,
+    }
+    result = {}
+    thread = TranslationThread(params)
+    thread.finished.connect(lambda success, message: result.update(success=success, message=message))
+    thread.run()
+    assert result.get("success"), result.get("message")
+    return thread, openpyxl.load_workbook(params['output_path']).active
+
+
+def test_glossary_constraint_bypasses_unconstrained_cache(tmp_path, monkeypatch, capture_api):
+    url, requests = capture_api
+    monkeypatch.setenv("TRANSLATION_API_URL", url)
+    monkeypatch.setenv("TRANSLATION_API_KEY", "test")
+    monkeypatch.setenv("MAX_CONCURRENT_REQUESTS", "2")
+    monkeypatch.setenv("TRANSLATION_CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.delenv("TRANSLATION_DAEMON_URL", raising=False)
+    monkeypatch.setattr(trans.APIConfig, "_instance", None)
+    monkeypatch.setattr(GlossaryIndex, "_loaded", {})
+
+    wb = openpyxl.Workbook()
+    wb.active.append(["中文"])
+    wb.active.append(["这款防水外套很轻"])
+    wb.active.append(["普通的帽子"])
+    wb.save(tmp_path / "input.xlsx")
+
+    run_job(tmp_path, "plain")
+    assert sorted(r["query"] for r in requests) == ["普通的帽子", "这款防水外套很轻"]
+    assert all("glossary" not in r for r in requests)
+
+    requests.clear()
+    glossary = write_glossary(tmp_path / "glossary.csv", [("防水", "waterproof", "防水")])
+    thread, _ = run_job(tmp_path, "glossary", str(glossary))
+    # 无术语的文本仍命中缓存；带术语的文本不能复用无约束的缓存译文
+    assert requests == [{"source_lang": "zh", "target_lang": "EN", "query": "这款防水外套很轻",
+                         "glossary": "防水 => waterproof"}]
+    assert thread.metrics['glossary_constrained'] == 1
+
+    # 同一术语表再次运行时，带约束的译文从术语表命名空间命中
+    requests.clear()
+    run_job(tmp_path, "again", str(glossary))
+    assert requests == []
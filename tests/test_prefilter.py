@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from trans import PREFILTER_RULE_NAMES, prefilter_column
+
+RULES = list(PREFILTER_RULE_NAMES)
+
+
+def rules_for(values, source_lang="zh", target_langs=("DE",), rules=RULES, sku_pattern=None):
+    row_rules, script_masks = prefilter_column(pd.Series(values, dtype=object), rules, source_lang,
+                                               list(target_langs), sku_pattern)
+    return [None if pd.isna(rule) else rule for rule in row_rules], script_masks
+
+
+@pytest.mark.parametrize("value, rule", [
+    (None, "empty"),
+    (np.nan, "empty"),
+    ("   ", "empty"),
+    ("12345", "number"),
+    ("1,299.00", "number"),
+    ("-3.5%", "number"),
+    ("2024/10/01", "number"),
+    ("A-1043", "sku"),
+    ("SKU_12", "sku"),
+    ("X200", "sku"),
+    ("https://example.com/a?b=1", "url"),
+    ("www.example.com", "url"),
+    ("sales@example.com", "email"),
+])
+def test_rows_that_need_no_translation(value, rule):
+    assert rules_for([value])[0] == [rule]
+
+
+@pytest.mark.parametrize("value", [
+    "你好世界",
+    "订单 A-1043 已发货",
+    "iPhone15",
+    "Level2",
+    "Win10",
+    "Free shipping",
+    "请访问 https://example.com",
+])
+def test_rows_that_still_need_translation(value):
+    assert rules_for([value])[0] == [None]
+
+
+def test_rules_can_be_disabled():
+    assert rules_for(["12345", "A-1043"], rules=["empty"])[0] == [None, None]
+
+
+def test_custom_sku_pattern():
+    assert rules_for(["ab-12"], sku_pattern=r"[a-z]+-\d+")[0] == ["sku"]
+
+
+def test_text_already_in_target_script():
+    values = ["こんにちは", "안녕하세요", "Καλημέρα", "नमस्ते", "你好", "こんにちは世界", None]
+    _, masks = rules_for(values, target_langs=("JA", "KO", "EL", "HI"))
+    assert masks["JA"].tolist() == [True, False, False, False, False, False, False]
+    assert masks["KO"].tolist() == [False, True, False, False, False, False, False]
+    assert masks["EL"].tolist() == [False, False, True, False, False, False, False]
+    assert masks["HI"].tolist() == [False, False, False, True, False, False, False]
+
+
+def test_latin_and_cyrillic_targets_are_never_skipped_by_script():
+    _, masks = rules_for(["Free shipping", "Привет"], target_langs=("EN", "DE", "FR", "RU", "UK"))
+    assert masks == {}
+
+
+def test_script_rule_ignores_rows_matched_by_other_rules():
+    _, masks = rules_for(["12345", "こんにちは"], target_langs=("JA",))
+    assert masks["JA"].tolist() == [False, True]
@@ -0,0 +1,33 @@
+import pytest
+
+from trans import estimate_makespan, split_capacity
+
+
+@pytest.mark.parametrize("capacity, weights", [
+    (10, {"EN": 1, "JA": 1, "DE": 1}),
+    (10, {"EN": 3, "JA": 1, "DE": 1, "FR": 1}),
+    (7, {"EN": 3, "JA": 3}),
+    (4, {"EN": 3, "JA": 1, "DE": 1, "FR": 1}),
+    (100, {code: 1 for code in "ABCDEFG"}),
+])
+def test_limits_sum_to_capacity(capacity, weights):
+    limits = split_capacity(capacity, weights)
+    assert sum(limits.values()) == capacity
+    assert min(limits.values()) >= 1
+
+
+def test_largest_remainder_follows_weights():
+    assert split_capacity(10, {"EN": 3, "JA": 1, "DE": 1}) == {"EN": 6, "JA": 2, "DE": 2}
+    assert split_capacity(10, {"EN": 1, "JA": 1, "DE": 1}) == {"EN": 4, "JA": 3, "DE": 3}
+
+
+def test_minimum_of_one_only_when_capacity_allows():
+    assert split_capacity(4, {"EN": 3, "JA": 1, "DE": 1, "FR": 1}) == {"EN": 1, "JA": 1, "DE": 1, "FR": 1}
+    limits = split_capacity(2, {"EN": 3, "JA": 1, "DE": 1})
+    assert limits == {"EN": 1, "JA": 1, "DE": 0}
+
+
+def test_makespan_uses_earliest_free_slot():
+    assert estimate_makespan([4, 3, 2, 1], 2) == 5
+    assert estimate_makespan([1, 2, 3, 4], 2) == 6
+    assert estimate_makespan([5], 0) == 5
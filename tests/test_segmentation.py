@@ -0,0 +1,31 @@
+import pytest
+
+from trans import join_segments, split_segments
+
+
+@pytest.mark.parametrize("text, lang", [
+    ("第一句话。" * 30 + "\n" + "第二段，很长的句子！" * 20, "zh"),
+    ("First sentence here. " * 40 + "\n\n  Second paragraph? Yes. " * 10, "en"),
+    ("句子没有结尾标点" * 60, "zh"),
+])
+def test_split_round_trip(text, lang):
+    pieces = split_segments(text, 100, lang)
+    assert "".join(piece + sep for piece, sep in pieces) == text
+    assert len(pieces) > 1 or "\n" not in text
+
+
+def test_pieces_respect_limit():
+    pieces = split_segments("This is a sentence. " * 50, 100, "en")
+    assert len(pieces) > 1
+    assert all(len(piece) <= 100 for piece, _ in pieces)
+
+
+def test_short_text_is_not_split():
+    assert split_segments("短文本。", 100, "zh") == [("短文本。", "")]
+    assert split_segments("x" * 500, 0, "en") == [("x" * 500, "")]
+
+
+def test_join_adds_space_only_for_spaced_languages():
+    assert join_segments(["Hallo.", "Welt."], ["", ""], "DE") == "Hallo. Welt."
+    assert join_segments(["こんにちは。", "世界。"], ["", ""], "JA") == "こんにちは。世界。"
+    assert join_segments(["Eins.", "Zwei."], ["\n", ""], "DE") == "Eins.\nZwei."
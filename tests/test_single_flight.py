@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from trans import SingleFlight
+
+
+def test_concurrent_identical_keys_share_one_call():
+    calls = []
+
+    async def run():
+        flight = SingleFlight()
+        gate = asyncio.Event()
+
+        async def request():
+            calls.append(1)
+            await gate.wait()
+            return "译文"
+
+        tasks = [asyncio.ensure_future(flight.run("key", request)) for _ in range(5)]
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert sorted(results, key=lambda r: r[1]) == [("译文", False)] + [("译文", True)] * 4
+
+
+def test_different_keys_are_not_merged():
+    calls = []
+
+    async def run():
+        flight = SingleFlight()
+
+        async def request(key):
+            calls.append(key)
+            await asyncio.sleep(0)
+            return key
+
+        return await asyncio.gather(*(flight.run(k, lambda k=k: request(k)) for k in ("a", "b", "a")))
+
+    assert asyncio.run(run()) == [("a", False), ("b", False), ("a", True)]
+    assert sorted(calls) == ["a", "b"]
+
+
+def test_exception_reaches_every_waiter():
+    calls = []
+
+    async def run():
+        flight = SingleFlight()
+        gate = asyncio.Event()
+
+        async def request():
+            calls.append(1)
+            await gate.wait()
+            raise ValueError("API错误(500)")
+
+        tasks = [asyncio.ensure_future(flight.run("key", request)) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(r, ValueError) and "500" in str(r) for r in results)
+
+
+def test_waiter_retries_when_leader_is_cancelled():
+    calls = []
+
+    async def run():
+        flight = SingleFlight()
+        gate = asyncio.Event()
+
+        async def request():
+            calls.append(1)
+            await gate.wait()
+            return "译文"
+
+        leader = asyncio.ensure_future(flight.run("key", request))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.run("key", request))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(run()) == ("译文", False)
+    assert len(calls) == 2
+
+
+def test_key_is_released_after_completion():
+    async def run():
+        flight = SingleFlight()
+
+        async def request():
+            return 1
+
+        first = await flight.run("key", request)
+        second = await flight.run("key", request)
+        return first, second, flight._inflight
+
+    assert asyncio.run(run()) == ((1, False), (1, False), {})
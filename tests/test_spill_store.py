@@ -0,0 +1,103 @@
+import threading
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from trans import JobRowSource, SpillResultStore, read_job_input
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "input.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "商品"
+    ws.append(["中文", "备注"])
+    for i in range(2500):
+        ws.append([f"文本 {i}", i])
+    other = wb.create_sheet("说明")
+    other.append(["未选中的表"])
+    wb.save(path)
+    return path
+
+
+def make_store(path):
+    _, segments, _, _ = read_job_input(str(path), ["商品"], ["中文"], low_memory=True)
+    store = SpillResultStore(str(path), segments, ["EN", "JA"], 16)
+    store.block_rows = 1000  # 让 2500 行跨越多个行块
+    return segments, store
+
+
+def test_spill_round_trip(workbook, tmp_path):
+    segments, store = make_store(workbook)
+    try:
+        for pos in range(0, 2500, 7):
+            store.set(pos, "EN", f"text {pos}")
+        store._flush()  # 第一批分片
+        store.set(0, "EN", "rewritten")  # 之后的分片覆盖之前的译文
+        store.set(1999, "JA", None)
+        store.set(2499, "JA", "テキスト")
+
+        en, ja = store.read_rows(segments[0], 995, 1005, ["英语(EN)", "日语(JA)"])
+        assert en == [None] * 6 + ["text 1001"] + [None] * 3
+        assert ja == [None] * 10
+        # 缓冲区中尚未溢写的译文也能读到，并覆盖之前的分片
+        assert store.read_rows(segments[0], 0, 2, ["英语(EN)"]) == [["rewritten", None]]
+        assert store.read_rows(segments[0], 2498, 2500, ["日语(JA)"]) == [[None, "テキスト"]]
+
+        output = tmp_path / "output.xlsx"
+        store.save(str(output))
+    finally:
+        store.close()
+
+    sheets = pd.read_excel(output, sheet_name=None)
+    assert list(sheets) == ["商品", "说明"]
+    df = sheets["商品"]
+    assert len(df) == 2500
+    assert df.at[0, "英语(EN)"] == "rewritten"
+    assert df.at[7, "英语(EN)"] == "text 7"
+    assert pd.isna(df.at[8, "英语(EN)"])
+    assert df.at[2499, "日语(JA)"] == "テキスト"
+    assert pd.isna(df.at[1999, "日语(JA)"])
+    assert df.at[2499, "备注"] == 2499
+    assert list(sheets["说明"].columns) == ["未选中的表"]
+
+
+def test_snapshot_ignores_later_parts(workbook, tmp_path):
+    segments, store = make_store(workbook)
+    try:
+        store.set(10, "EN", "before")
+        snap = store.snapshot()
+        store.set(10, "EN", "after")
+        store._flush()
+        assert snap.read_rows(segments[0], 10, 11, ["英语(EN)"]) == [["before"]]
+        assert store.read_rows(segments[0], 10, 11, ["英语(EN)"]) == [["after"]]
+    finally:
+        store.close()
+
+
+def test_preview_reads_blocks_in_background(workbook):
+    segments, store = make_store(workbook)
+    texts = pd.Series([f"文本 {i}" for i in range(2500)])
+    source = JobRowSource(texts, segments, store, ["EN"])
+    loaded = threading.Event()
+    source.on_loaded = lambda first, last: loaded.set()
+    try:
+        store.set(3, "EN", "first")
+        assert source.value(3, 2) is None  # 块尚未读取，先显示为空
+        assert loaded.wait(5)
+        assert source.value(3, 2) == "first"
+
+        store.set(3, "EN", "second")
+        loaded.clear()
+        source.refresh()
+        assert source.value(3, 2) == "first"  # 重新读取期间仍显示旧内容
+        assert loaded.wait(5)
+        assert source.value(3, 2) == "second"
+        assert source.find("second", 0, 2500) == (3, 2)
+    finally:
+        source.close()
+        store.close()
@@ -0,0 +1,49 @@
+import pytest
+
+from trans import mask_text, restore_text
+
+
+@pytest.mark.parametrize("text", [
+    "价格 12.5 元，库存 300 件",
+    "订单 A-1043 已发货，编号 SKU_12",
+    "欢迎 {user}，您有 %s 条消息，第 %1$d 页",
+    "详情见 https://example.com/item/2024/10?id=77",
+    "没有任何数字的文本",
+])
+def test_mask_restore_round_trip(text):
+    template, values = mask_text(text)
+    assert restore_text(template, values) == text
+
+
+def test_mask_groups_texts_that_differ_only_in_values():
+    assert mask_text("剩余 3 天")[0] == mask_text("剩余 30 天")[0] == "剩余 {0} 天"
+    assert mask_text("剩余 3 天")[1] == ("3",)
+
+
+@pytest.mark.parametrize("text", ["iPhone15 手机", "MP3 播放器", "Win10 系统", "5G 网络", "v1.2.3 版本", "A1B2"])
+def test_digits_inside_words_are_not_masked(text):
+    assert mask_text(text) == (text, ())
+
+
+def test_numbers_next_to_cjk_and_codes_with_suffix_are_masked():
+    assert mask_text("库存:300件，iPhone15 售价 5999") == ("库存:{0}件，iPhone15 售价 {1}", ("300", "5999"))
+    assert mask_text("A-1043号商品") == ("{0}号商品", ("A-1043",))
+
+
+def test_restore_follows_reordered_placeholders():
+    _, values = mask_text("从 A-1 到 B-2")
+    assert restore_text("to {1} from {0}", values) == "to B-2 from A-1"
+
+
+@pytest.mark.parametrize("translation", [
+    "Price {0} yuan",             # 缺少 {1}
+    "Price {0} yuan, {0} left",   # 重复 {0}
+    "Price yuan",                 # 标记全部丢失
+])
+def test_restore_rejects_damaged_placeholders(translation):
+    _, values = mask_text("价格 12.5 元，库存 300 件")
+    assert restore_text(translation, values) is None
+
+
+def test_restore_without_values_returns_translation():
+    assert restore_text("Hello {0}", ()) == "Hello {0}"
@@ -0,0 +1,85 @@
+import zipfile
+
+import openpyxl
+
+from trans import SheetInfo, read_xlsx_headers
+
+MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+RELS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+
+def write_package(path, parts):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, content in parts.items():
+            zf.writestr(name, content)
+    return path
+
+
+def test_reads_openpyxl_workbook(tmp_path):
+    path = tmp_path / "book.xlsx"
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "商品"
+    ws.append(["中文", "备注", None, "英文"])
+    for i in range(10):
+        ws.append([f"文本 {i}", i, None, "text"])
+    other = wb.create_sheet("说明")
+    other.append(["中文"])
+    wb.save(path)
+
+    assert read_xlsx_headers(str(path)) == [
+        SheetInfo("商品", ["中文", "备注", "英文"], 10),
+        SheetInfo("说明", ["中文"], 0),
+    ]
+
+
+def test_reads_shared_inline_and_rich_strings(tmp_path):
+    workbook = (
+        f'<workbook xmlns="{MAIN}" xmlns:r="{RELS}"><sheets>'
+        '<sheet name="数据" sheetId="1" r:id="rId1"/>'
+        '<sheet name="附表" sheetId="2" r:id="rId2"/>'
+        '</sheets></workbook>'
+    )
+    rels = (
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Target="/xl/worksheets/sheet2.xml"/>'
+        '</Relationships>'
+    )
+    shared = (
+        f'<sst xmlns="{MAIN}" count="4" uniqueCount="4">'
+        '<si><t>未使用</t></si>'
+        '<si><t>中文</t></si>'
+        '<si><r><t>商品</t></r><r><rPr><b/></rPr><t>名称</t></r></si>'  # 富文本分段
+        '<si><t>日本語</t><rPh sb="0" eb="3"><t>にほんご</t></rPh></si>'  # 注音不计入
+        '</sst>'
+    )
+    sheet1 = (
+        f'<worksheet xmlns="{MAIN}"><dimension ref="A1:E26"/><sheetData>'
+        '<row r="1">'
+        '<c r="A1" t="s"><v>1</v></c>'
+        '<c r="B1" t="inlineStr"><is><t>英文</t></is></c>'
+        '<c r="C1" t="s"><v>2</v></c>'
+        '<c r="D1"><v>2024</v></c>'
+        '<c r="E1" t="s"><v>3</v></c>'
+        '</row>'
+        '<row r="2"><c r="A2" t="inlineStr"><is><t>不是表头</t></is></c></row>'
+        '</sheetData></worksheet>'
+    )
+    sheet2 = (
+        f'<worksheet xmlns="{MAIN}"><sheetData>'
+        '<row r="1"><c r="A1" t="inlineStr"><is><r><t>备</t></r><r><t>注</t></r></is></c><c r="B1"/></row>'
+        '</sheetData></worksheet>'
+    )
+    path = write_package(tmp_path / "raw.xlsx", {
+        "xl/workbook.xml": workbook,
+        "xl/_rels/workbook.xml.rels": rels,
+        "xl/sharedStrings.xml": shared,
+        "xl/worksheets/sheet1.xml": sheet1,
+        "xl/worksheets/sheet2.xml": sheet2,
+    })
+
+    assert read_xlsx_headers(str(path)) == [
+        SheetInfo("数据", ["中文", "英文", "商品名称", "2024", "日本語"], 25),
+        SheetInfo("附表", ["备注"], None),
+    ]
@@ -7,17 +7,47 @@ import sys
 from datetime import datetime
 from pathlib import Path
 
-from PyQt5.QtGui import QIcon
+from PyQt5.QtGui import QIcon, QPainter, QPen, QColor
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QLineEdit, QPushButton, QFileDialog, QRadioButton,
-                             QButtonGroup, QCheckBox, QGroupBox, QTextEdit, QProgressBar)
+                             QButtonGroup, QCheckBox, QGroupBox, QTextEdit, QProgressBar,
+                             QSpinBox, QTabWidget, QGridLayout, QComboBox, QTableView, QHeaderView)
 from dotenv import load_dotenv
 
 # 常量配置
-DEFAULT_TIMEOUT = 30
+DEFAULT_TIMEOUT = 30  # 耗时模型样本不足时的请求超时
+CONNECT_TIMEOUT = 5  # 建立连接的超时
+MIN_REQUEST_TIMEOUT = 5
+MAX_REQUEST_TIMEOUT = 300
+DEFAULT_TIMEOUT_FACTOR = 3  # 请求超时 = 预估耗时 × 倍数 + 余量
+TIMEOUT_MARGIN = 2
+DEADLINE_MARGIN = 2  # 距任务时限不足该秒数时不再派发新请求
+DAEMON_TIMEOUT = 600  # 经本地翻译服务的请求需要在服务端排队，超时放宽
+DEFAULT_DAEMON_PORT = 8790
 
 REQUEST_INTERVAL = 0.1
 
+DEFAULT_MEMORY_BUDGET_MB = 512  # 低内存模式默认内存预算
+
+DEFAULT_SEGMENT_MAX_CHARS = 400  # 超过该长度的单元格按句子切分后并发翻译
+DEFAULT_HEDGE_PERCENTILE = 95  # 请求耗时超过该分位数仍未返回时补发副本
+DEFAULT_HEDGE_MAX_RATIO = 0.05  # 补发副本数不超过请求数的比例，0 表示关闭对冲
+PRIORITY_LANG_WEIGHT = 3  # 优先语言分到的并发额度是普通语言的倍数
+DEFAULT_LOOP_STALL_MS = 200  # 事件循环阻塞超过该毫秒数时记录阻塞位置
+DEFAULT_COMPRESS_MIN_BYTES = 1024  # 请求体达到该字节数才压缩
+
+DASHBOARD_INTERVAL_MS = 1000  # 仪表盘刷新间隔
+DASHBOARD_WINDOW = 10  # 速率按最近该秒数滚动计算
+DASHBOARD_HISTORY = 120  # 趋势图保留的点数
+ETA_EWMA_ALPHA = 0.3  # 预计剩余时间使用的速率平滑系数
+TOKENS_PER_CHAR = {"zh": 1.0, "en": 0.25}  # 估算 token 数时每个原文字符对应的 token 数
+PREVIEW_BLOCK_ROWS = 500  # 预览表每次读取/缓存的行数
+PREVIEW_SEARCH_ROWS = 5000  # 查找 [ERROR] 时每轮最多检查的行数，其余留到下一轮事件循环
+
+SCHEDULE_POLICIES = ("lpt", "fifo")  # 最长任务优先 / 按行顺序
+SCHEDULE_FULL_SORT_LIMIT = 2_000_000  # 超过该请求数时只按模板排序，避免排序矩阵过大
+MAKESPAN_SIMULATION_LIMIT = 200_000  # 超过该请求数时不做逐个模拟，只给出下界
+
 TARGET_LANGUAGES = {
     "EN": "英语",
     "JA": "日语",
@@ -43,6 +73,56 @@ TARGET_LANGUAGES = {
     "HI": "印地语"
 }
 
+# 预过滤规则（按顺序匹配）及摘要中的显示名
+PREFILTER_RULE_NAMES = {
+    "empty": "空值",
+    "number": "纯数字",
+    "sku": "编号/SKU",
+    "url": "链接",
+    "email": "邮箱",
+    "script": "已是目标文字",
+}
+
+PREFILTER_PATTERNS = {
+    "number": r"[+\-]?[\d\s,.:/%+\-]*\d[\d\s,.:/%+\-]*",
+    # 大写字母与数字组成、两者都有的整格编号（A-1043、SKU_12、X200），不含小写字母，避免误伤 iPhone15、Win10 等词
+    "sku": r"#?(?=[A-Z0-9\-_/.#]*\d)(?=[A-Z0-9\-_/.#]*[A-Z])[A-Z0-9]+(?:[\-_/.#][A-Z0-9]+)*",
+    "url": r"(?:https?://|www\.)\S+",
+    "email": r"[\w.+\-]+@[\w\-]+(?:\.[\w\-]+)+",
+}
+
+# 相似文本合并：数字、编号、{var}/%s 占位符替换为 {0}、{1}... 标记
+# 编号和数字前后不能紧邻字母或数字，iPhone15、MP3、5G 等词整体保留，不拆出数字
+PLACEHOLDER_PATTERN = re.compile(
+    r"\{[^{}]*\}"                                                                      # {var} 占位符
+    r"|%(?:\d+\$)?[sdf]"                                                                # printf 风格占位符
+    r"|(?<![A-Za-z0-9_])[A-Z][A-Z0-9]*[-_]\d[A-Za-z0-9_\-]*"                              # A-1043、SKU_12 等编号
+    r"|(?<![A-Za-z0-9_])(?<![A-Za-z0-9_][.,:])\d+(?:[.,:]\d+)*(?![A-Za-z0-9_]|[.,:]\d)"  # 数字
+)
+TOKEN_PATTERN = re.compile(r"\{(\d+)\}")
+
+# 超长文本切分：按源语言的句末标点断句（标点后可跟引号/括号）
+SENTENCE_PATTERNS = {
+    "zh": re.compile(r"(.+?(?:[。！？；!?;…]+[”’」』）)\"']*|$))(\s*)", re.S),
+    "en": re.compile(r"(.+?(?:[.!?;]+[\"')\]]*(?=\s)|$))(\s*)", re.S),
+}
+NO_SPACE_LANGS = {"JA"}  # 拼接片段时句间不补空格的目标语言
+
+# 源语言/目标语言的文字范围，用于判断单元格是否已是目标语言文字
+LATIN_SCRIPT = "[A-Za-z\u00c0-\u024f]"
+SOURCE_SCRIPTS = {
+    "zh": "[\u4e00-\u9fff]",
+    "en": LATIN_SCRIPT,
+}
+# 只收录文字为该语言独有的目标语言：拉丁字母（英/德/法…）、西里尔字母（俄/乌）
+# 由多种目标语言共用，单凭文字无法判断是否已是目标语言，不能跳过
+TARGET_SCRIPTS = {
+    "JA": "[\u3040-\u30ff]",
+    "KO": "[\uac00-\ud7af]",
+    "EL": "[\u0370-\u03ff]",
+    "HI": "[\u0900-\u097f]",
+}
+
 
 
 
@@ -63,9 +143,49 @@ class APIConfig:
         self.API_KEY = os.getenv("TRANSLATION_API_KEY")
         self.API_URL = os.getenv("TRANSLATION_API_URL")
         self.MAX_CONCURRENT_REQUESTS = os.getenv("MAX_CONCURRENT_REQUESTS")
+        self.MEMORY_BUDGET_MB = os.getenv("MEMORY_BUDGET_MB", str(DEFAULT_MEMORY_BUDGET_MB))
+        self.PREFILTER_RULES = os.getenv("PREFILTER_RULES", ",".join(PREFILTER_RULE_NAMES))
+        self.PREFILTER_SKU_PATTERN = os.getenv("PREFILTER_SKU_PATTERN", "")
+        self.GLOSSARY_PATH = os.getenv("GLOSSARY_PATH", "")
+        self.SCHEDULE_POLICY = os.getenv("SCHEDULE_POLICY", "lpt")
+        self.SEGMENT_MAX_CHARS = os.getenv("SEGMENT_MAX_CHARS", str(DEFAULT_SEGMENT_MAX_CHARS))
+        self.HEDGE_PERCENTILE = os.getenv("HEDGE_PERCENTILE", str(DEFAULT_HEDGE_PERCENTILE))
+        self.HEDGE_MAX_RATIO = os.getenv("HEDGE_MAX_RATIO", str(DEFAULT_HEDGE_MAX_RATIO))
+        self.PRIORITY_LANGS = os.getenv("PRIORITY_LANGS", "")
+        self.TRANSLATION_DAEMON_URL = os.getenv("TRANSLATION_DAEMON_URL", "")
+        self.LOOP_STALL_MS = os.getenv("LOOP_STALL_MS", str(DEFAULT_LOOP_STALL_MS))
+        self.FAST_PATH = os.getenv("FAST_PATH", "0")
+        self.REQUEST_COMPRESSION = os.getenv("REQUEST_COMPRESSION", "off")
+        self.COMPRESS_MIN_BYTES = os.getenv("COMPRESS_MIN_BYTES", str(DEFAULT_COMPRESS_MIN_BYTES))
+        self.REQUEST_TIMEOUT_FACTOR = os.getenv("REQUEST_TIMEOUT_FACTOR", str(DEFAULT_TIMEOUT_FACTOR))
+        self.TRANSLATION_CACHE_PATH = os.getenv(
+            "TRANSLATION_CACHE_PATH", str(Path.home() / ".transgui" / "translation_memory.sqlite3")
+        )
 
         if not self.API_KEY or not self.API_URL:
             raise ValueError("未找到API配置，请检查.env文件")
+        self.ENDPOINTS = self._load_endpoints()
+
+    def _load_endpoints(self):
+        """读取接口列表：TRANSLATION_API_URL/KEY 为第1个，之后依次为 _2、_3 …
+
+        每个接口可单独设置 MAX_CONCURRENT_REQUESTS_n 和 REQUEST_INTERVAL_n，未设置时沿用默认值。
+        """
+        endpoints = []
+        index = 1
+        while True:
+            suffix = "" if index == 1 else f"_{index}"
+            url = os.getenv(f"TRANSLATION_API_URL{suffix}")
+            key = os.getenv(f"TRANSLATION_API_KEY{suffix}")
+            if not url or not key:
+                break
+            endpoints.append((
+                url, key,
+                int(os.getenv(f"MAX_CONCURRENT_REQUESTS{suffix}") or self.MAX_CONCURRENT_REQUESTS),
+                float(os.getenv(f"REQUEST_INTERVAL{suffix}") or REQUEST_INTERVAL),
+            ))
+            index += 1
+        return endpoints
     @classmethod
     def get_resource_path(cls, relative_path):
         """ 获取资源文件的绝对路径（兼容开发环境和打包环境） """
@@ -81,194 +201,3530 @@ class APIConfig:
             if path.exists():
                 return str(path)
 
-        raise FileNotFoundError(f"找不到资源文件: {relative_path}")
+        raise FileNotFoundError(f"找不到资源文件: {relative_path}")
+
+    @property
+    def key(self) -> str:
+        return self.API_KEY
+
+    @property
+    def url(self) -> str:
+        return self.API_URL
+
+    @property
+    def workers(self) -> str:
+        return self.MAX_CONCURRENT_REQUESTS
+
+    @property
+    def endpoints(self) -> list:
+        """[(url, key, 并发数, 请求间隔秒数)]"""
+        return self.ENDPOINTS
+
+    @property
+    def memory_budget_mb(self) -> int:
+        return int(self.MEMORY_BUDGET_MB)
+
+    @property
+    def prefilter_rules(self) -> list:
+        rules = [r.strip() for r in self.PREFILTER_RULES.split(",")]
+        return [r for r in rules if r in PREFILTER_RULE_NAMES]
+
+    @property
+    def sku_pattern(self) -> str:
+        return self.PREFILTER_SKU_PATTERN
+
+    @property
+    def cache_path(self) -> str:
+        return self.TRANSLATION_CACHE_PATH
+
+    @property
+    def glossary_path(self) -> str:
+        return self.GLOSSARY_PATH
+
+    @property
+    def schedule_policy(self) -> str:
+        policy = self.SCHEDULE_POLICY.strip().lower()
+        return policy if policy in SCHEDULE_POLICIES else "lpt"
+
+    @property
+    def segment_max_chars(self) -> int:
+        return int(self.SEGMENT_MAX_CHARS)
+
+    @property
+    def hedge_percentile(self) -> float:
+        return float(self.HEDGE_PERCENTILE)
+
+    @property
+    def hedge_max_ratio(self) -> float:
+        return float(self.HEDGE_MAX_RATIO)
+
+    @property
+    def priority_langs(self) -> str:
+        return self.PRIORITY_LANGS
+
+    @property
+    def daemon_url(self) -> str:
+        return self.TRANSLATION_DAEMON_URL.rstrip("/")
+
+    @property
+    def loop_stall_ms(self) -> int:
+        return int(self.LOOP_STALL_MS)
+
+    @property
+    def fast_path(self) -> bool:
+        return self.FAST_PATH.strip().lower() in ("1", "true", "yes", "on")
+
+    @property
+    def request_compression(self) -> bool:
+        """是否用 gzip 压缩较大的请求体（需要接口支持 Content-Encoding: gzip）"""
+        return self.REQUEST_COMPRESSION.strip().lower() in ("gzip", "1", "true", "on")
+
+    @property
+    def compress_min_bytes(self) -> int:
+        return int(self.COMPRESS_MIN_BYTES)
+
+    @property
+    def request_timeout_factor(self) -> float:
+        return float(self.REQUEST_TIMEOUT_FACTOR)
+
+    @property
+    def data_dir(self) -> Path:
+        """缓存、术语索引、耗时统计等本地数据所在目录"""
+        return Path(self.TRANSLATION_CACHE_PATH).parent
+
+def get_api_config() -> APIConfig:
+    """获取API配置单例"""
+    return APIConfig()
+
+
+import argparse
+import asyncio
+import bisect
+import cProfile
+import copy
+import functools
+import glob
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import multiprocessing
+import pickle
+import posixpath
+import pstats
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+import tracemalloc
+import unicodedata
+import zipfile
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from xml.etree import ElementTree
+import aiohttp
+from aiohttp import web
+import numpy as np
+import openpyxl
+import pandas as pd
+from collections import Counter, deque, namedtuple
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal, QAbstractTableModel, QModelIndex
+
+try:  # 低内存模式依赖 pyarrow（可选）
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+try:  # 性能分析模式优先使用 yappi（可选，按实际耗时统计协程）
+    import yappi
+except ImportError:
+    yappi = None
+
+try:  # 加速模式：uvloop 事件循环（可选，不支持 Windows）
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:  # 加速模式：orjson 编解码请求和响应（可选）
+    import orjson
+except ImportError:
+    orjson = None
+
+try:  # 响应支持 brotli 压缩（可选）
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# 定义提取括号内容的函数
+def extract_bracket_text(col_name):
+    match = re.search(r'\((.*?)\)', col_name)  # 正则匹配括号内容
+    return match.group(1) if match else ""     # 返回括号内文本（若无括号则返回空字符串）
+
+
+def sort_result_columns(columns):
+    """首列保持不变，其余列按括号内语言代码排序"""
+    columns = list(columns)
+    return [columns[0]] + sorted(columns[1:], key=lambda x: extract_bracket_text(x))
+
+
+def iter_sheet_rows(ws):
+    """流式遍历工作表：先返回表头，再返回数据行（去掉末尾空行，与 pandas 行号一致）"""
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    yield [f"Unnamed: {i}" if h is None else str(h) for i, h in enumerate(header)]
+
+    width = len(header)
+    blank_rows = 0
+    for row in rows:
+        row = tuple(row[:width]) + (None,) * (width - len(row))
+        if all(v is None for v in row):
+            blank_rows += 1  # 暂存空行，后面出现数据行时再补上
+            continue
+        for _ in range(blank_rows):
+            yield (None,) * width
+        blank_rows = 0
+        yield row
+
+
+# 一个待翻译的文本来源：某个工作表中的某一列，在全局文本序列中占据 [offset, offset + length)
+SheetInfo = namedtuple("SheetInfo", ["name", "columns", "rows"])  # rows: 数据行数（不含表头），未知时为 None
+
+
+def _local_name(tag):
+    """去掉 XML 命名空间前缀"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _cell_row(ref):
+    """单元格引用（如 C1048）中的行号"""
+    digits = ref.lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+    return int(digits) if digits.isdigit() else None
+
+
+def read_xlsx_headers(path):
+    """直接解析 xlsx 压缩包：读取工作表名、每表表头行和 dimension 中的行数，不读取单元格数据
+
+    共享字符串只读到表头引用的最大序号为止。
+    """
+    with zipfile.ZipFile(path) as zf:
+        rels = {}
+        for rel in ElementTree.fromstring(zf.read("xl/_rels/workbook.xml.rels")):
+            target = rel.get("Target", "")
+            rels[rel.get("Id")] = target.lstrip("/") if target.startswith("/") else posixpath.normpath(
+                posixpath.join("xl", target)
+            )
+        sheets = []
+        for node in ElementTree.fromstring(zf.read("xl/workbook.xml")).iter():
+            if _local_name(node.tag) == "sheet":
+                rid = next(v for k, v in node.attrib.items() if _local_name(k) == "id")
+                sheets.append((node.get("name"), rels[rid]))
+
+        headers = []  # [(表名, [(类型, 值)], 行数)]
+        shared_needed = set()
+        for name, target in sheets:
+            rows, header, cell = None, [], None
+            with zf.open(target) as f:
+                for event, node in ElementTree.iterparse(f, events=("start", "end")):
+                    tag = _local_name(node.tag)
+                    if event == "start" and tag == "dimension":
+                        last = node.get("ref", "").split(":")[-1]
+                        rows = _cell_row(last) - 1 if _cell_row(last) else None
+                    elif event == "start" and tag == "c":
+                        cell = [node.get("t"), None]
+                    elif event == "end" and tag in ("v", "t") and cell is not None:
+                        cell[1] = (cell[1] or "") + (node.text or "")
+                    elif event == "end" and tag == "c":
+                        header.append(tuple(cell))
+                        if cell[0] == "s" and cell[1] is not None:
+                            shared_needed.add(int(cell[1]))
+                        cell = None
+                    elif event == "end" and tag == "row":
+                        break  # 只需要第一行
+            headers.append((name, header, rows))
+
+        shared = {}
+        if shared_needed and "xl/sharedStrings.xml" in zf.namelist():
+            index, text = 0, []
+            with zf.open("xl/sharedStrings.xml") as f:
+                for event, node in ElementTree.iterparse(f, events=("end",)):
+                    tag = _local_name(node.tag)
+                    if tag == "t":
+                        text.append(node.text or "")
+                    elif tag == "rPh":
+                        text = text[:-1] if text else text  # 注音文字不属于正文
+                    elif tag == "si":
+                        if index in shared_needed:
+                            shared[index] = "".join(text)
+                        index, text = index + 1, []
+                        if index > max(shared_needed):
+                            break
+                        node.clear()
+
+    result = []
+    for name, header, rows in headers:
+        columns = []
+        for kind, value in header:
+            if kind == "s":
+                value = shared.get(int(value)) if value is not None else None
+            if value not in (None, ""):
+                columns.append(value)
+        result.append(SheetInfo(name, columns, rows))
+    return result
+
+
+@functools.lru_cache(maxsize=32)
+def _inspect_workbook(path, mtime):
+    if path.lower().endswith(".xlsx"):
+        try:
+            return tuple(read_xlsx_headers(path))
+        except Exception:
+            pass  # 非常规结构的文件退回 openpyxl 只读模式
+        wb = openpyxl.load_workbook(path, read_only=True)
+        try:
+            result = []
+            for ws in wb.worksheets:
+                header = next(ws.iter_rows(max_row=1, values_only=True), ())
+                result.append(SheetInfo(
+                    ws.title, [str(h) for h in header if h not in (None, "")],
+                    ws.max_row - 1 if ws.max_row else None
+                ))
+            return tuple(result)
+        finally:
+            wb.close()
+    with pd.ExcelFile(path) as xls:
+        return tuple(
+            SheetInfo(name, [str(c) for c in xls.parse(name, nrows=0).columns], None) for name in xls.sheet_names
+        )
+
+
+def inspect_workbook(path):
+    """读取工作簿的工作表名、表头和行数（不加载单元格数据），按文件路径和修改时间缓存"""
+    path = os.path.abspath(path)
+    return _inspect_workbook(path, os.path.getmtime(path))
+
+
+TextSegment = namedtuple("TextSegment", ["sheet", "column", "offset", "length", "prefix"])
+
+
+def target_column(segment, lang_code):
+    """译文列名：工作表只有一个文本列时为 名称(代码)，多个文本列时加原列名前缀"""
+    return f"{segment.prefix}{TARGET_LANGUAGES[lang_code]}({lang_code})"
+
+
+def locate_segment(segments, offsets, pos):
+    """根据全局位置找到 (文本来源, 工作表内行号)"""
+    segment = segments[bisect.bisect_right(offsets, pos) - 1]
+    return segment, pos - segment.offset
+
+
+def split_names(value):
+    """拆分逗号分隔的名称列表（兼容中文逗号）"""
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in re.split(r"[,，]", value or "") if v.strip()]
+
+
+def select_sheets(sheet_names, sheets):
+    """按任务定义选择工作表：默认第一个，* 表示全部"""
+    if not sheets:
+        return sheet_names[:1]
+    if "*" in sheets:
+        return list(sheet_names)
+    missing = [name for name in sheets if name not in sheet_names]
+    if missing:
+        raise ValueError(f"找不到工作表: {', '.join(missing)}")
+    return list(sheets)
+
+
+def build_segments(columns_by_sheet, text_columns):
+    """按工作表和列的顺序生成文本来源列表，缺失的列跳过"""
+    segments, skipped, offset = [], [], 0
+    for sheet, (columns, length) in columns_by_sheet.items():
+        selected = [c for c in text_columns if c in columns]
+        skipped.extend(f"{sheet}[{c}]" for c in text_columns if c not in columns)
+        for column in selected:
+            prefix = "" if len(selected) == 1 else f"{column}-"
+            segments.append(TextSegment(sheet, column, offset, length, prefix))
+            offset += length
+    if not segments:
+        raise ValueError(f"找不到文本列: {', '.join(text_columns)}")
+    return segments, skipped
+
+
+def read_columns_lowmem(ws, columns, dtype="string[pyarrow]"):
+    """低内存模式：流式读取工作表中存在的指定列，默认使用 Arrow 字符串存储"""
+    rows = iter_sheet_rows(ws)
+    header = next(rows, [])
+    columns = [c for c in dict.fromkeys(columns) if c and c in header]
+    indexes = [header.index(c) for c in columns]
+    values = [[] for _ in columns]
+    for row in rows:
+        for values_list, col_idx in zip(values, indexes):
+            values_list.append(None if row[col_idx] is None else str(row[col_idx]))
+    return pd.DataFrame({c: pd.array(v, dtype=dtype) for c, v in zip(columns, values)})
+
+
+def read_job_input(input_path, sheets, text_columns, low_memory=False, extra_columns=None):
+    """读取任务涉及的工作表，返回 (各表 DataFrame, 文本来源列表, 全局文本序列, 被跳过的列)
+
+    默认模式读取全部工作表（写回时保留未选中的表）；低内存模式只读取选中表的
+    文本列及 extra_columns(表名, 文本列) 返回的附加列。
+    """
+    if low_memory:
+        if pa is None:
+            raise RuntimeError("低内存模式需要安装 pyarrow")
+        if not str(input_path).lower().endswith(".xlsx"):
+            raise ValueError("低内存模式仅支持 .xlsx 文件")
+        wb = openpyxl.load_workbook(input_path, read_only=True)
+        try:
+            frames = {}
+            for sheet in select_sheets(wb.sheetnames, sheets):
+                columns = list(text_columns)
+                for column in text_columns:
+                    columns += extra_columns(sheet, column) if extra_columns else []
+                frames[sheet] = read_columns_lowmem(wb[sheet], columns)
+        finally:
+            wb.close()
+        selected = frames
+    else:
+        frames = pd.read_excel(input_path, sheet_name=None)
+        selected = {name: frames[name] for name in select_sheets(list(frames), sheets)}
+
+    segments, skipped = build_segments(
+        {name: (set(df.columns), len(df)) for name, df in selected.items()}, text_columns
+    )
+    texts = pd.concat([frames[seg.sheet][seg.column] for seg in segments], ignore_index=True)
+    return frames, segments, texts, skipped
+
+
+def read_text_columns(input_path, sheets, text_columns, extra_columns=None):
+    """预估用：只读取表头、文本列及 extra_columns(表名, 文本列) 返回的附加列
+
+    返回 (各表 DataFrame, 文本来源列表, 全局文本序列, 被跳过的列)。
+    """
+    def columns_for(sheet):
+        columns = list(text_columns)
+        for column in text_columns:
+            columns += extra_columns(sheet, column) if extra_columns else []
+        return columns
+
+    if str(input_path).lower().endswith(".xlsx"):
+        wb = openpyxl.load_workbook(input_path, read_only=True)
+        try:
+            frames = {sheet: read_columns_lowmem(wb[sheet], columns_for(sheet), dtype="string")
+                      for sheet in select_sheets(wb.sheetnames, sheets)}
+        finally:
+            wb.close()
+    else:
+        # .xls 不能流式读取；需要附加列时整表读取
+        usecols = None if extra_columns else (lambda column: column in text_columns)
+        frames = pd.read_excel(input_path, sheet_name=None, usecols=usecols)
+        frames = {name: frames[name] for name in select_sheets(list(frames), sheets)}
+    # 流式读取时只有存在文本列的表才有行数，其余表按缺列跳过
+    segments, skipped = build_segments(
+        {name: (set(df.columns), len(df)) for name, df in frames.items()}, text_columns
+    )
+    texts = pd.concat([frames[seg.sheet][seg.column] for seg in segments], ignore_index=True)
+    return frames, segments, texts, skipped
+
+
+def is_valid_translation(value):
+    """判断单元格是否为有效译文（非空且不是错误标记）"""
+    if value is None or pd.isna(value):
+        return False
+    value = str(value).strip()
+    return bool(value) and value != "[ERROR]"
+
+
+def normalize_key(value):
+    """统一匹配键：空值返回 None，其余转为去首尾空白的字符串"""
+    if value is None or pd.isna(value):
+        return None
+    return str(value).strip()
+
+
+def count_pending(pending):
+    """统计待翻译单元格数量"""
+    return int(sum(mask.sum() for mask in pending.values()))
+
+
+def group_by_template(texts, needed, mask_placeholders):
+    """把 needed 为真的行按（掩码后的）模板分组：{模板: array('I', [全局位置, ...])}
+
+    行号用 4 字节的 array 保存，百万行时比 Python 整数列表省内存；
+    模板字符串每个唯一模板只保留一份。
+    """
+    groups = {}
+    for row_idx in np.flatnonzero(needed).tolist():
+        text = str(texts.iat[row_idx])
+        template = mask_text(text)[0] if mask_placeholders else text
+        rows = groups.get(template)
+        if rows is None:
+            rows = groups[template] = array("I")
+        rows.append(row_idx)
+    return groups
+
+
+def prefilter_column(texts, rules, source_lang, target_langs, sku_pattern=None):
+    """向量化预过滤：返回每行命中的通用规则名，以及每种目标语言“已是目标文字”的掩码"""
+    # 使用 Python 字符串存储，保证正则语义与 re 模块一致
+    text = texts.astype(pd.StringDtype("python")).str.strip()
+    row_rules = pd.Series(pd.NA, index=texts.index, dtype="object")
+
+    patterns = dict(PREFILTER_PATTERNS)
+    if sku_pattern:
+        patterns["sku"] = sku_pattern
+    for rule in rules:
+        if rule == "empty":
+            mask = text.isna() | (text == "")
+        elif rule in patterns:
+            mask = text.str.fullmatch(patterns[rule]).fillna(False)
+        else:
+            continue
+        mask = mask.astype(bool) & row_rules.isna()
+        row_rules[mask] = rule
+
+    script_masks = {}
+    if "script" in rules and source_lang in SOURCE_SCRIPTS:
+        # 含有目标语言文字且不含源语言文字，视为已是目标语言
+        no_source = ~text.str.contains(SOURCE_SCRIPTS[source_lang]).fillna(True).astype(bool)
+        free = no_source & row_rules.isna()
+        for code in target_langs:
+            script = TARGET_SCRIPTS.get(code)
+            if script is None or script == SOURCE_SCRIPTS[source_lang]:
+                continue
+            has_target = text.str.contains(script).fillna(False).astype(bool)
+            script_masks[code] = (free & has_target).to_numpy(dtype=bool)
+
+    return row_rules, script_masks
+
+
+def job_extra_columns(text_columns, target_langs, key_column=None, repair=False):
+    """返回 extra_columns(表名, 文本列) 回调：只读取部分列时还需要的匹配键列、修复模式下的已有译文列"""
+
+    def extra_columns(sheet, column):
+        prefix = "" if len(text_columns) == 1 else f"{column}-"
+        columns = [key_column] if key_column else []
+        if repair:
+            columns += [f"{prefix}{TARGET_LANGUAGES[code]}({code})" for code in target_langs]
+            columns += [f"{TARGET_LANGUAGES[code]}({code})" for code in target_langs]
+        return columns
+
+    return extra_columns
+
+
+def mark_valid_cells(frames, segments, pending):
+    """修复模式：已有有效译文的单元格不再翻译，返回保留数量"""
+    kept = 0
+    for segment in segments:
+        df = frames[segment.sheet]
+        span = slice(segment.offset, segment.offset + segment.length)
+        for code, mask in pending.items():
+            column = target_column(segment, code)
+            if column not in df.columns:
+                continue  # 整列缺失，全部需要翻译
+            valid = df[column].map(is_valid_translation).to_numpy(dtype=bool)
+            kept += int((valid & mask[span]).sum())
+            mask[span] &= ~valid
+    return kept
+
+
+def reuse_previous_translations(frames, segments, pending, previous_path, key_column, write=None):
+    """对比上一版输出文件，可复用的译文从待翻译中移除，并通过 write(全局位置, 语言代码, 译文) 写入结果
+
+    返回 (新增行, 变更行, 删除行, 复用单元格)。
+    """
+    previous_sheets = pd.read_excel(previous_path, sheet_name=None)
+    added_rows = changed_rows = removed_rows = reused = 0
+
+    for segment in segments:
+        df = frames[segment.sheet]
+        previous = previous_sheets.get(segment.sheet)
+        if previous is None and len(previous_sheets) == 1:
+            previous = next(iter(previous_sheets.values()))  # 单表文件不要求表名一致
+        if previous is None:
+            added_rows += segment.length
+            continue
+
+        text_column = segment.column
+        match_column = key_column or text_column
+        for column in (match_column, text_column):
+            if column not in previous.columns:
+                raise ValueError(f"上一版文件中找不到列: {segment.sheet}[{column}]")
+            if column not in df.columns:
+                raise ValueError(f"找不到匹配键列: {segment.sheet}[{column}]")
+
+        # 上一版中按匹配键建立索引（重复键以首次出现为准）
+        lang_columns = {code: target_column(segment, code) for code in pending}
+        lang_columns = {code: col for code, col in lang_columns.items() if col in previous.columns}
+        prev_index = {}
+        for prev_idx, key in previous[match_column].items():
+            key = normalize_key(key)
+            if key is not None and key not in prev_index:
+                prev_index[key] = prev_idx
+
+        matched = set()
+        for row_idx, key in df[match_column].items():
+            key = normalize_key(key)
+            prev_idx = prev_index.get(key) if key is not None else None
+            if prev_idx is None:
+                added_rows += 1
+                continue
+            matched.add(prev_idx)
+            # 按键列匹配时，原文变化的行需要重新翻译
+            if key_column and normalize_key(df.at[row_idx, text_column]) != normalize_key(previous.at[prev_idx, text_column]):
+                changed_rows += 1
+                continue
+
+            pos = segment.offset + row_idx
+            for code, column in lang_columns.items():
+                value = previous.at[prev_idx, column]
+                if is_valid_translation(value):
+                    if write is not None:
+                        write(pos, code, value)
+                    pending[code][pos] = False
+                    reused += 1
+        removed_rows += len(set(prev_index.values()) - matched)
+
+    return added_rows, changed_rows, removed_rows, reused
+
+
+def apply_prefilter(texts, pending, rules, source_lang, sku_pattern=None, write=None):
+    """按预过滤规则把无需翻译的单元格从待翻译中移除，返回 {规则: 跳过单元格数}
+
+    write(全局位置, 语言代码, 值) 写入原值（空值写 None）。
+    """
+    row_rules, script_masks = prefilter_column(texts, rules, source_lang, list(pending), sku_pattern)
+    skips = Counter()
+
+    for rule in rules:
+        if rule == "script":
+            continue
+        rows = np.flatnonzero((row_rules == rule).to_numpy(dtype=bool))
+        for code, mask in pending.items():
+            selected = rows[mask[rows]]
+            if write is not None:
+                for row_idx in selected:
+                    write(row_idx, code, None if rule == "empty" else texts.iat[row_idx])
+            mask[selected] = False
+            skips[rule] += len(selected)
+
+    # 已经是目标语言文字的单元格按语言分别处理
+    for code, script_mask in script_masks.items():
+        mask = pending[code]
+        selected = np.flatnonzero(script_mask & mask)
+        if write is not None:
+            for row_idx in selected:
+                write(row_idx, code, texts.iat[row_idx])
+        mask[selected] = False
+        skips["script"] += len(selected)
+    return skips
+
+
+def apply_glossary(glossary, texts, pending, write=None):
+    """整格匹配术语表的单元格从待翻译中移除，返回命中数；write(全局位置, 语言代码, 译文) 写入术语译文"""
+    keys = texts.astype(pd.StringDtype("python")).str.strip().str.casefold()
+    hits = 0
+    for code, mask in pending.items():
+        whole = glossary.whole.get(code)
+        if not whole:
+            continue
+        matched = keys.map(whole)
+        selected = np.flatnonzero(matched.notna().to_numpy(dtype=bool) & mask)
+        if write is not None:
+            for row_idx in selected:
+                write(row_idx, code, matched.iat[row_idx])
+        mask[selected] = False
+        hits += len(selected)
+    return hits
+
+
+def mask_text(text):
+    """把数字、编号和占位符替换为 {0}、{1}... 标记，返回 (模板, 原始值)"""
+    values = []
+
+    def repl(match):
+        values.append(match.group(0))
+        return "{%d}" % (len(values) - 1)
+
+    return PLACEHOLDER_PATTERN.sub(repl, text), tuple(values)
+
+
+def placeholders_intact(translation, count):
+    """检查译文中 {0}..{count-1} 每个标记恰好出现一次"""
+    tokens = [int(t) for t in TOKEN_PATTERN.findall(translation)]
+    return sorted(t for t in tokens if t < count) == list(range(count))
+
+
+def restore_text(translation, values):
+    """把模板译文中的标记还原为原始值，标记缺失或重复时返回 None"""
+    if not values:
+        return translation
+    if not placeholders_intact(translation, len(values)):
+        return None
+
+    def repl(match):
+        index = int(match.group(1))
+        return values[index] if index < len(values) else match.group(0)
+
+    return TOKEN_PATTERN.sub(repl, translation)
+
+
+def same_tokens(source, translation):
+    """检查译文保留了原文中的全部 {n} 标记（不多不少）"""
+    return sorted(TOKEN_PATTERN.findall(source)) == sorted(TOKEN_PATTERN.findall(translation))
+
+
+def split_segments(text, max_chars, source_lang):
+    """超长文本按段落和句子切分，返回 [(片段, 分隔符)]，依次拼接可还原原文
+
+    段落（换行）总是切开；段落内按句末标点断句，再把相邻句子合并到不超过 max_chars。
+    单个句子超长时保持完整，不在句中切断。
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [(text, "")]
+    pattern = SENTENCE_PATTERNS.get(source_lang, SENTENCE_PATTERNS["en"])
+
+    sentences = []  # (句子, 句后空白)
+    parts = re.split(r"(\n[\s]*)", text)
+    for i in range(0, len(parts), 2):
+        paragraph = parts[i]
+        newline = parts[i + 1] if i + 1 < len(parts) else ""
+        units = [(m.group(1), m.group(2)) for m in pattern.finditer(paragraph) if m.group(1)]
+        if not units:
+            if sentences:
+                sentences[-1] = (sentences[-1][0], sentences[-1][1] + paragraph + newline)
+            else:
+                sentences.append((paragraph, newline))
+            continue
+        units[-1] = (units[-1][0], units[-1][1] + newline)
+        sentences.extend(units)
+
+    chunks, current, current_sep = [], "", ""
+    for sentence, sep in sentences:
+        if current and ("\n" in current_sep or len(current) + len(current_sep) + len(sentence) > max_chars):
+            chunks.append((current, current_sep))
+            current, current_sep = sentence, sep
+        elif current:
+            current, current_sep = current + current_sep + sentence, sep
+        else:
+            current, current_sep = sentence, sep
+    if current or current_sep:
+        chunks.append((current, current_sep))
+    return chunks
+
+
+def join_segments(pieces, separators, lang_code):
+    """按原分隔符拼接片段译文；原文句间无空白时，为使用空格分词的语言补一个空格"""
+    parts = []
+    for i, (piece, sep) in enumerate(zip(pieces, separators)):
+        if not sep and i < len(pieces) - 1 and lang_code not in NO_SPACE_LANGS:
+            sep = " "
+        parts.append(piece.strip() + sep)
+    return "".join(parts)
+
+
+def mask_translation(translation, values):
+    """按原文的占位值把已有译文转换为模板译文，找不到某个值时返回 None"""
+    taken = []
+    for index, value in enumerate(values):
+        start = translation.find(value)
+        while start != -1 and any(start < e and s < start + len(value) for s, e, _ in taken):
+            start = translation.find(value, start + 1)
+        if start == -1:
+            return None
+        taken.append((start, start + len(value), index))
+
+    parts, pos = [], 0
+    for start, end, index in sorted(taken):
+        parts.append(translation[pos:start])
+        parts.append("{%d}" % index)
+        pos = end
+    parts.append(translation[pos:])
+    return "".join(parts)
+
+
+def scan_translated_workbook(path, source_column):
+    """读取一个已翻译工作簿（流式），返回 (去重后的翻译对, 跳过数量)
+
+    翻译对为 (目标语言代码, 原文模板, 译文模板)，与翻译缓存的键一致。
+    """
+    pairs, skipped = set(), 0
+    wb = openpyxl.load_workbook(path, read_only=True)
+    try:
+        for ws in wb.worksheets:
+            rows = iter_sheet_rows(ws)
+            header = next(rows, [])
+            lang_columns = {i: extract_bracket_text(h) for i, h in enumerate(header)}
+            lang_columns = {i: code for i, code in lang_columns.items() if code in TARGET_LANGUAGES}
+            if source_column in header:
+                default_idx = header.index(source_column)
+            else:
+                # 找不到指定列时，取第一个不是语言列的列
+                default_idx = next((i for i in range(len(header)) if i not in lang_columns), None)
+
+            # 多文本列的结果形如 "原列名-英语(EN)"，译文对应前缀所指的原文列（原列名本身可能含 "-"，取最长的匹配）
+            sources = {}
+            for col_idx in lang_columns:
+                prefixes = [i for i, h in enumerate(header)
+                            if i not in lang_columns and header[col_idx].startswith(f"{h}-")]
+                source_idx = max(prefixes, key=lambda i: len(header[i]), default=default_idx)
+                if source_idx is not None:
+                    sources[col_idx] = source_idx
+            if not sources:
+                continue
+
+            for row in rows:
+                masked = {}
+                for col_idx, source_idx in sources.items():
+                    source = row[source_idx]
+                    if not is_valid_translation(source):
+                        continue
+                    if source_idx not in masked:
+                        masked[source_idx] = mask_text(str(source).strip())
+                    template, values = masked[source_idx]
+                    code = lang_columns[col_idx]
+                    target = row[col_idx]
+                    if not is_valid_translation(target):
+                        skipped += 1
+                        continue
+                    target = mask_translation(str(target).strip(), values)
+                    if target is None:
+                        skipped += 1  # 译文中找不到原文的数字/编号，无法转为模板
+                        continue
+                    pairs.add((code, template, target))
+    finally:
+        wb.close()
+    return pairs, skipped
+
+
+class TranslationMemory:
+    """持久化翻译缓存（SQLite），按 (源语言, 目标语言, 原文) 保存译文"""
+
+    COMMIT_EVERY = 200
+
+    def __init__(self, path, commit_every=COMMIT_EVERY):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.commit_every = commit_every  # 未提交的写入会占用写锁，与其他进程共用文件时应设为 1
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # 多个实例可同时读写
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " source_lang TEXT NOT NULL, target_lang TEXT NOT NULL,"
+            " source_text TEXT NOT NULL, target_text TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (source_lang, target_lang, source_text)) WITHOUT ROWID"
+        )
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def lookup(self, source_lang, source_text):
+        """查询某条原文在所有目标语言下的缓存译文"""
+        rows = self.conn.execute(
+            "SELECT target_lang, target_text FROM translations WHERE source_lang = ? AND source_text = ?",
+            (source_lang, source_text)
+        )
+        return dict(rows.fetchall())
+
+    def get(self, source_lang, target_lang, source_text):
+        row = self.conn.execute(
+            "SELECT target_text FROM translations WHERE source_lang = ? AND target_lang = ? AND source_text = ?",
+            (source_lang, target_lang, source_text)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, source_lang, target_lang, source_text, target_text):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)",
+            (source_lang, target_lang, source_text, target_text, time.time())
+        )
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def import_pairs(self, source_lang, pairs):
+        """批量导入翻译对，已有相同译文计为重复，已有不同译文计为冲突（保留原译文）"""
+        imported = duplicates = conflicts = 0
+        now = time.time()
+        for target_lang, source_text, target_text in pairs:
+            row = self.conn.execute(
+                "SELECT target_text FROM translations WHERE source_lang = ? AND target_lang = ? AND source_text = ?",
+                (source_lang, target_lang, source_text)
+            ).fetchone()
+            if row is None:
+                self.conn.execute(
+                    "INSERT INTO translations VALUES (?, ?, ?, ?, ?)",
+                    (source_lang, target_lang, source_text, target_text, now)
+                )
+                imported += 1
+            elif row[0] == target_text:
+                duplicates += 1
+            else:
+                conflicts += 1
+        self.commit()
+        return imported, duplicates, conflicts
+
+    def commit(self):
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+
+class AhoCorasick:
+    """多模式匹配自动机（纯 Python 实现，可直接 pickle 缓存）"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.lengths = [len(p) for p in patterns]
+
+        for idx, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append(idx)
+
+        # 广度优先构建失败指针
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                if state:
+                    self.fail[nxt] = self.goto[fallback].get(char, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def find(self, text):
+        """返回所有匹配 (起始位置, 结束位置, 模式序号)"""
+        state = 0
+        for pos, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for idx in self.output[state]:
+                yield pos + 1 - self.lengths[idx], pos + 1, idx
+
+
+class GlossaryIndex:
+    """术语表索引：整格精确匹配用哈希表，内嵌术语用 Aho-Corasick 自动机"""
+
+    CACHE_VERSION = 2
+    _loaded = {}  # 进程内缓存: 路径 -> (文件签名, 索引)
+
+    def __init__(self, terms, translations):
+        self.terms = terms                      # 原文术语列表
+        self.translations = translations        # {语言代码: {术语序号: 译文}}
+        # 按内容计算的指纹：不同机器上内容相同的术语表指纹一致，供本地翻译服务区分缓存
+        self.fingerprint = hashlib.sha1(
+            json.dumps([terms, translations], ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+        self.whole = {code: {terms[i].casefold(): text for i, text in mapping.items()}
+                      for code, mapping in translations.items()}
+        self.automaton = AhoCorasick([t.casefold() for t in terms])
+
+    @classmethod
+    def load(cls, path, cache_dir):
+        """加载术语表，优先使用内存和磁盘上的预编译索引"""
+        stat = os.stat(path)
+        signature = (os.path.abspath(path), stat.st_mtime, stat.st_size, cls.CACHE_VERSION)
+        cached = cls._loaded.get(signature[0])
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        digest = hashlib.sha1(signature[0].encode("utf-8")).hexdigest()[:16]
+        cache_path = Path(cache_dir) / f"glossary_{digest}.pkl"
+        index = None
+        if cache_path.exists():
+            try:
+                with open(cache_path, "rb") as f:
+                    saved_signature, index = pickle.load(f)
+                if saved_signature != signature:
+                    index = None
+            except Exception:
+                index = None
+
+        if index is None:
+            index = cls.build(path)
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(cache_path, "wb") as f:
+                pickle.dump((signature, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        cls._loaded[signature[0]] = (signature, index)
+        return index
+
+    @classmethod
+    def build(cls, path):
+        """从 CSV/Excel 读取术语表：首列为原文，其余列表头为 名称(代码) 或语言代码"""
+        if str(path).lower().endswith(".csv"):
+            df = pd.read_csv(path, dtype=str, encoding="utf-8-sig")
+        else:
+            df = pd.read_excel(path, dtype=str)
+
+        lang_columns = {}
+        for column in df.columns[1:]:
+            code = (extract_bracket_text(str(column)) or str(column)).strip().upper()
+            if code in TARGET_LANGUAGES:
+                lang_columns[code] = column
+
+        terms, translations = [], {code: {} for code in lang_columns}
+        seen = {}
+        for row in df.itertuples(index=False):
+            term = row[0]
+            if not is_valid_translation(term):
+                continue
+            term = str(term).strip()
+            idx = seen.setdefault(term.casefold(), len(terms))
+            if idx == len(terms):
+                terms.append(term)
+            for code, column in lang_columns.items():
+                value = row[df.columns.get_loc(column)]
+                if is_valid_translation(value):
+                    translations[code].setdefault(idx, str(value).strip())
+        return cls(terms, translations)
+
+    def lookup(self, text, lang_code):
+        """整格匹配：返回术语译文，未命中返回 None"""
+        return self.whole.get(lang_code, {}).get(str(text).strip().casefold())
+
+    def constraints(self, text, lang_code):
+        """内嵌术语：返回文本中出现的术语及其译文（重叠时取最长）"""
+        mapping = self.translations.get(lang_code)
+        if not mapping:
+            return []
+        matches = sorted(self.automaton.find(str(text).casefold()), key=lambda m: (m[0] - m[1], m[0]))
+        taken, result = [], []
+        for start, end, idx in matches:
+            if idx not in mapping or any(start < e and s < end for s, e in taken):
+                continue
+            taken.append((start, end))
+            result.append((self.terms[idx], mapping[idx]))
+        return result
+
+
+def format_glossary(constraints):
+    """把术语约束格式化为请求参数"""
+    return "\n".join(f"{term} => {translation}" for term, translation in constraints)
+
+
+def cache_namespace(source_lang, fingerprint=""):
+    """缓存使用的源语言键：带术语约束的译文按术语表指纹单独存放，避免与无约束的译文混用"""
+    return f"{source_lang}@{fingerprint}" if fingerprint else source_lang
+
+
+def glossary_namespace(glossary, text, source_lang, lang_code):
+    """某条文本译为某语言时的缓存源语言键（命中带译文的内嵌术语时使用术语表命名空间）"""
+    if glossary is not None and glossary.constraints(text, lang_code):
+        return cache_namespace(source_lang, glossary.fingerprint)
+    return source_lang
+
+
+def lookup_cached(cache, glossary, text, source_lang, target_langs):
+    """查询一条文本在各目标语言下的缓存译文，受术语约束的语言从术语表命名空间读取"""
+    hits = cache.lookup(source_lang, text)
+    if glossary is not None and next(glossary.automaton.find(text.casefold()), None) is not None:
+        constrained = cache.lookup(cache_namespace(source_lang, glossary.fingerprint), text)
+        hits = {code: constrained.get(code) if glossary.constraints(text, code) else hits.get(code)
+                for code in target_langs}
+    return {code: t for code, t in hits.items() if code in target_langs and t is not None}
+
+
+class LatencyModel:
+    """按语言估计请求耗时：耗时 ≈ 固定开销 + 每字符耗时 × 字符数
+
+    使用指数衰减的最小二乘拟合，结果保存到本地，供下次任务调度使用。
+    """
+
+    DEFAULT_BASE = 1.0
+    DEFAULT_PER_CHAR = 0.01
+    DECAY = 0.995
+    MIN_SAMPLES = 5
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.stats = {}  # 语言代码 -> [n, Σx, Σy, Σx², Σxy]
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.stats = {k: list(v) for k, v in json.load(f).items()}
+        except Exception:
+            pass
+
+    def observe(self, lang_code, chars, seconds):
+        """记录一次成功请求的耗时"""
+        st = self.stats.setdefault(lang_code, [0.0] * 5)
+        for i in range(5):
+            st[i] *= self.DECAY
+        for i, value in enumerate((1.0, chars, seconds, chars * chars, chars * seconds)):
+            st[i] += value
+
+    def coefficients(self, lang_code):
+        """返回 (固定开销秒数, 每字符秒数)"""
+        st = self.stats.get(lang_code)
+        if not st or st[0] < self.MIN_SAMPLES:
+            return self.DEFAULT_BASE, self.DEFAULT_PER_CHAR
+        n, sx, sy, sxx, sxy = st
+        denom = n * sxx - sx * sx
+        per_char = (n * sxy - sx * sy) / denom if denom > 1e-9 else 0.0
+        per_char = max(per_char, 0.0)
+        base = max((sy - per_char * sx) / n, 0.05)
+        return base, per_char
+
+    def estimate(self, lang_code, chars):
+        base, per_char = self.coefficients(lang_code)
+        return base + per_char * chars
+
+    def is_trained(self, lang_code):
+        st = self.stats.get(lang_code)
+        return bool(st) and st[0] >= self.MIN_SAMPLES
+
+    def save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.stats, f)
+        except Exception:
+            pass
+
+
+class Endpoint:
+    """单个翻译接口的并发、限速与健康状态"""
+
+    def __init__(self, name, url, key, concurrency, interval):
+        self.name = name
+        self.url = url
+        self.headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
+        self.concurrency = max(1, concurrency)
+        self.interval = interval
+        self.outstanding = 0  # 在途请求数
+        self.last_request_time = 0.0
+        self.slowness = 1.0  # 实际耗时 / 预估耗时 的指数平均
+        self.requests = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+    def score(self):
+        """路由评分：(在途请求数 + 1) × 相对耗时，越小越优先"""
+        return (self.outstanding + 1) * self.slowness
+
+
+class EndpointPool:
+    """多接口负载均衡：按在途请求数和相对耗时选择接口，连续失败的接口暂时剔除"""
+
+    EJECT_FAILURES = 3
+    EJECT_SECONDS = 30.0
+    SLOWNESS_ALPHA = 0.2
+
+    def __init__(self, configs):
+        self.endpoints = []
+        for i, (url, key, concurrency, interval) in enumerate(configs, 1):
+            host = urlparse(url).netloc or url
+            self.endpoints.append(Endpoint(f"接口{i}({host})", url, key, concurrency, interval))
+        self.capacity = sum(e.concurrency for e in self.endpoints)
+        self._released = None  # asyncio.Event，在事件循环内创建
+
+    def _pick(self, avoid=None):
+        now = time.time()
+        free = [e for e in self.endpoints if e.outstanding < e.concurrency]
+        healthy = [e for e in free if e.ejected_until <= now]
+        if not healthy:
+            if not free or any(e.ejected_until <= now for e in self.endpoints):
+                return None  # 健康接口都已占满，等待释放
+            # 所有接口都被剔除时放行剔除最早到期的接口，避免任务卡死
+            return min(free, key=lambda e: e.ejected_until)
+        candidates = [e for e in healthy if e is not avoid]
+        if candidates:
+            return min(candidates, key=Endpoint.score)
+        if avoid is not None and any(e is not avoid and e.ejected_until <= now for e in self.endpoints):
+            return None  # 其他健康接口暂时占满，等待而不是回到刚失败的接口
+        return min(healthy, key=Endpoint.score)
+
+    async def acquire(self, avoid=None):
+        """占用一个接口的并发槽，avoid 为刚失败的接口（有其他可用接口时避开）"""
+        if self._released is None:
+            self._released = asyncio.Event()
+        while True:
+            endpoint = self._pick(avoid)
+            if endpoint is not None:
+                endpoint.outstanding += 1
+                return endpoint
+            self._released.clear()
+            try:
+                await asyncio.wait_for(self._released.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass  # 定期重试，以便剔除到期的接口恢复使用
+
+    def release(self, endpoint, seconds=None, estimate=None, unhealthy=False):
+        """释放并发槽并更新接口状态；seconds 为成功请求的耗时"""
+        endpoint.outstanding -= 1
+        endpoint.requests += 1
+        if seconds is not None:
+            endpoint.busy_seconds += seconds
+        if unhealthy:
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.EJECT_FAILURES and endpoint.ejected_until <= time.time():
+                endpoint.consecutive_failures = 0
+                endpoint.ejected_until = time.time() + self.EJECT_SECONDS
+                endpoint.ejections += 1
+        elif seconds is not None and estimate:
+            endpoint.consecutive_failures = 0
+            ratio = seconds / max(estimate, 1e-3)
+            endpoint.slowness += self.SLOWNESS_ALPHA * (ratio - endpoint.slowness)
+        self._released.set()
+
+
+class HedgePolicy:
+    """对冲请求策略：请求发出后超过自适应阈值仍未返回，就补发一个副本
+
+    阈值取近期“实际耗时 / 预估耗时”比值的分位数乘以本次预估耗时；
+    补发次数不超过已发起请求数的 max_ratio，避免成倍增加调用量。
+    """
+
+    WINDOW = 500
+    MIN_SAMPLES = 20
+
+    def __init__(self, percentile, max_ratio):
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.ratios = deque(maxlen=self.WINDOW)
+        self.requests = 0
+        self.hedges = 0
+
+    @property
+    def enabled(self):
+        return self.max_ratio > 0 and 0 < self.percentile < 100
+
+    def observe(self, estimate, seconds):
+        """记录一次完成的请求耗时"""
+        self.ratios.append(seconds / max(estimate, 1e-3))
+
+    def threshold(self, estimate):
+        """返回本次请求的对冲等待秒数，未启用或样本不足时返回 None"""
+        if not self.enabled or len(self.ratios) < self.MIN_SAMPLES:
+            return None
+        ratios = sorted(self.ratios)
+        k = min(len(ratios) - 1, int(len(ratios) * self.percentile / 100))
+        return ratios[k] * estimate
+
+    def allow(self):
+        """检查对冲预算，允许时计入一次补发"""
+        if self.hedges + 1 > self.max_ratio * self.requests:
+            return False
+        self.hedges += 1
+        return True
+
+
+class SingleFlight:
+    """在途请求合并：同一时刻相同的请求只发送一次，其余调用方等待同一个结果
+
+    由本地翻译服务使用：多个程序实例的任务经服务在同一个事件循环中请求，
+    各自的相同文本会在这里合并（单个任务内已按模板和片段去重，进程内不再合并）。
+    发起请求的一方被取消时，等待方改为自己重新发起请求。
+    """
+
+    _ABANDONED = object()
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def run(self, key, request):
+        """执行 request() 或等待相同 key 的在途请求，返回 (结果, 是否为合并等待)"""
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            result = await asyncio.shield(future)
+            if result is not self._ABANDONED:
+                return result, True
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await request()
+        except asyncio.CancelledError:
+            future.set_result(self._ABANDONED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 没有等待方时不报告“异常未被读取”
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._inflight.pop(key, None)
+
+
+def estimate_makespan(costs, workers):
+    """按给定顺序贪心分配给最先空闲的并发槽，返回预计总用时"""
+    workers = max(1, int(workers))
+    finish = [0.0] * workers
+    for cost in costs:
+        heapq.heapreplace(finish, finish[0] + float(cost))
+    return max(finish)
+
+
+def split_capacity(capacity, weights):
+    """按权重把并发额度分给各语言（最大余数法），各语言额度之和恰好等于 capacity
+
+    额度不少于语言数时每种语言至少分到 1；额度不足时部分语言分到 0，等其他语言完成后再分配。
+    """
+    total = sum(weights.values())
+    if not total:
+        return {code: 0 for code in weights}
+    quotas = {code: capacity * weight / total for code, weight in weights.items()}
+    limits = {code: int(quota) for code, quota in quotas.items()}
+    remaining = capacity - sum(limits.values())
+    for code in sorted(quotas, key=lambda c: (limits[c] - quotas[c], -weights[c]))[:remaining]:
+        limits[code] += 1
+    if capacity >= len(weights):
+        for code in [c for c, limit in limits.items() if limit == 0]:
+            limits[max(limits, key=limits.get)] -= 1  # 从额度最多的语言让出 1 个
+            limits[code] = 1
+    return limits
+
+
+def format_duration(seconds):
+    """秒数格式化为 时:分:秒"""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def estimate_job(groups, cached, source_lang, target_langs, latency_model, endpoints, segment_max_chars,
+                 pending=None):
+    """按模板、缓存命中和各语言历史耗时估算 API 请求数、字符数、token 数和翻译用时
+
+    给出 pending 时，某语言只统计仍有待翻译行的模板（与翻译时按语言派发一致）；
+    超长文本按切分后的片段计请求，同一语言中相同片段只计一次；用时取按最长优先派发的模拟结果，
+    且不低于各接口请求间隔限制下的最短用时。
+    """
+    templates = list(groups)
+    pieces = [
+        [piece for piece, _ in split_segments(t, segment_max_chars, source_lang)] if len(t) > segment_max_chars > 0
+        else [t]
+        for t in templates
+    ]
+    requests, chars, costs = 0, {}, []
+    for code in target_langs:
+        base, per_char = latency_model.coefficients(code)
+        lang_chars = 0
+        seen_pieces = set()
+        for template, parts in zip(templates, pieces):
+            if code in cached.get(template, ()):
+                continue
+            if pending is not None and not pending[code][np.frombuffer(groups[template], dtype=np.uint32)].any():
+                continue
+            if len(parts) > 1:
+                parts = [part for part in parts if part not in seen_pieces]
+                seen_pieces.update(parts)
+            requests += len(parts)
+            for part in parts:
+                lang_chars += len(part)
+                costs.append(base + per_char * len(part))
+        chars[code] = lang_chars
+
+    workers = endpoints.capacity
+    if not costs:
+        seconds = 0.0
+    elif len(costs) <= MAKESPAN_SIMULATION_LIMIT:
+        seconds = estimate_makespan(sorted(costs, reverse=True), workers)
+    else:
+        seconds = max(sum(costs) / workers, max(costs))
+    # 每个接口两次请求之间至少间隔 REQUEST_INTERVAL，请求数多时这是主要瓶颈
+    if all(e.interval > 0 for e in endpoints.endpoints):
+        seconds = max(seconds, requests / sum(1.0 / e.interval for e in endpoints.endpoints))
+    total_chars = sum(chars.values())
+    return {
+        'requests': requests,
+        'chars': chars,
+        'tokens': int(total_chars * TOKENS_PER_CHAR.get(source_lang, 1.0)),
+        'seconds': seconds,
+        'workers': workers,
+    }
+
+
+def format_estimate(est):
+    """预估结果的日志行"""
+    lines = []
+    if 'rows' in est:
+        lines.append(
+            f"预估: 行数 {est['rows']} | 单元格 {est['cells']} | 无需请求 {est['skipped']} | "
+            f"唯一模板 {est['templates']} | 缓存命中 {est['cache_hits']}"
+        )
+    lines.append(
+        f"预估: API请求 {est['requests']} | 原文字符 {sum(est['chars'].values())} | 约 {est['tokens']} tokens | "
+        f"翻译用时约 {format_duration(est['seconds'])} (并发 {est['workers']})"
+    )
+    if len(set(est['chars'].values())) > 1:
+        lines.append("预估各语言字符: " + " | ".join(f"{code} {n}" for code, n in est['chars'].items()))
+    return lines
+
+
+def preflight_estimate(params, api_config):
+    """开始翻译前的快速预估：只读取表头、文本列和所需的附加列，按与翻译相同的步骤
+    （增量更新、修复模式、预过滤、术语表整格命中）确定各语言待翻译的单元格，
+    再按相似文本合并和翻译缓存统计唯一文本、缓存命中和各语言字符数，用历史耗时估算请求数和用时
+    """
+    text_columns = split_names(params.get('text_columns') or params['text_column'])
+    source_lang = params['source_lang']
+    target_langs = params['target_langs']
+    previous_path = params.get('previous_path')
+    key_column = params.get('key_column') or None
+    repair = params.get('repair', False)
+    frames, segments, texts, skipped_columns = read_text_columns(
+        params['input_path'], split_names(params.get('sheets')), text_columns,
+        job_extra_columns(text_columns, target_langs, key_column, repair)
+    )
+    pending = {code: np.ones(len(texts), dtype=bool) for code in target_langs}
+    cells = count_pending(pending)
+
+    if previous_path:
+        reuse_previous_translations(frames, segments, pending, previous_path, key_column)
+    if repair:
+        mark_valid_cells(frames, segments, pending)
+    if params.get('prefilter', True):
+        rules = params.get('prefilter_rules') or api_config.prefilter_rules
+        apply_prefilter(texts, pending, rules, source_lang, api_config.sku_pattern)
+    glossary = None
+    if params.get('glossary_path'):
+        glossary = GlossaryIndex.load(params['glossary_path'], api_config.data_dir)
+        apply_glossary(glossary, texts, pending)
+
+    needed = np.logical_or.reduce(list(pending.values())) if pending else np.zeros(len(texts), dtype=bool)
+    groups = group_by_template(texts, needed, params.get('mask_placeholders', True))
+    cached = {}
+    if params.get('use_cache', True):
+        cache = TranslationMemory(api_config.cache_path)
+        try:
+            for template in groups:
+                hits = lookup_cached(cache, glossary, template, source_lang, target_langs)
+                if hits:
+                    cached[template] = hits
+        finally:
+            cache.close()
+
+    est = estimate_job(
+        groups, cached, source_lang, target_langs,
+        LatencyModel(api_config.data_dir / "latency_model.json"),
+        EndpointPool(api_config.endpoints), api_config.segment_max_chars, pending
+    )
+    est.update(
+        rows=len(texts),
+        cells=cells,
+        skipped=cells - count_pending(pending),
+        templates=len(groups),
+        cache_hits=sum(len(hits) for hits in cached.values()),
+        skipped_columns=skipped_columns,
+    )
+    return est
+
+
+class DataFrameResultStore:
+    """默认结果存储：译文直接写入内存中各工作表的 DataFrame
+
+    翻译线程写入、界面预览读取，两者用锁互斥（写入新列或改变列类型时 DataFrame 会重新分配）。
+    """
+
+    def __init__(self, frames, segments):
+        selected = {seg.sheet for seg in segments}
+        self.frames = {name: df.copy() if name in selected else df for name, df in frames.items()}
+        self.selected = selected
+        self.segments = segments
+        self.offsets = [seg.offset for seg in segments]
+        self._lock = threading.Lock()
+
+    def set(self, pos, lang_code, value):
+        segment, row_idx = locate_segment(self.segments, self.offsets, pos)
+        with self._lock:
+            self.frames[segment.sheet].at[row_idx, target_column(segment, lang_code)] = value
+
+    def read_rows(self, segment, start, stop, columns):
+        """读取工作表第 start~stop 行的指定列（按列返回，缺失的列为 None）"""
+        with self._lock:
+            part = self.frames[segment.sheet].iloc[start:stop]
+            return [part[c].tolist() if c in part.columns else [None] * len(part) for c in columns]
+
+    def snapshot(self):
+        """复制当前结果，供后台线程提前保存"""
+        with self._lock:
+            return DataFrameResultStore(self.frames, self.segments)
+
+    def save(self, output_path):
+        with pd.ExcelWriter(output_path) as writer:
+            for name, df in self.frames.items():
+                if name in self.selected:
+                    df = df[sort_result_columns(df.columns)]
+                df.to_excel(writer, sheet_name=name, index=False)
+
+    def close(self):
+        pass
+
+
+class SpillResultStore:
+    """低内存模式结果存储：译文按行块缓冲并溢写为 Parquet，保存时流式拼装输出
+
+    缓冲区按行块分组，预览可以读到尚未溢写的译文；翻译线程写入与预览读取用锁互斥。
+    """
+
+    def __init__(self, input_path, segments, target_langs, memory_budget_mb):
+        if pa is None:
+            raise RuntimeError("低内存模式需要安装 pyarrow")
+        budget = max(int(memory_budget_mb), 16) * 1024 * 1024
+
+        self.input_path = input_path
+        self.segments = segments
+        self.offsets = [seg.offset for seg in segments]
+        self.sheet_ids = {name: i for i, name in enumerate(dict.fromkeys(seg.sheet for seg in segments))}
+        self.target_columns = {name: [] for name in self.sheet_ids}
+        for seg in segments:
+            self.target_columns[seg.sheet] += [target_column(seg, code) for code in target_langs]
+
+        # 预算一分为二：写入缓冲区 + 保存时单个行块的译文
+        widest = max(len(columns) for columns in self.target_columns.values())
+        self.flush_bytes = budget // 2
+        self.block_rows = max(1000, (budget // 2) // (max(widest, 1) * 512))
+        self.spill_dir = tempfile.mkdtemp(prefix="trans_spill_")
+        self._buffer = {}  # (工作表序号, 行块) -> [(行号, 列名, 译文)]
+        self._buffered_bytes = 0
+        self._part = 0
+        self._max_part = None  # 快照只读取该编号之前的分片
+        self._lock = threading.Lock()
+
+    def set(self, pos, lang_code, value):
+        segment, row_idx = locate_segment(self.segments, self.offsets, pos)
+        value = "" if value is None else str(value)
+        key = (self.sheet_ids[segment.sheet], int(row_idx) // self.block_rows)
+        with self._lock:
+            self._buffer.setdefault(key, []).append((int(row_idx), target_column(segment, lang_code), value))
+            self._buffered_bytes += sys.getsizeof(value) + 120  # 粗略估算元组和列名开销
+            if self._buffered_bytes >= self.flush_bytes:
+                self._flush()
+
+    def _flush(self):
+        """把缓冲区中的译文按 (工作表, 行块) 写成 Parquet 分片（调用方持有锁）"""
+        if not self._buffer:
+            return
+        for (sheet_id, block), items in self._buffer.items():
+            rows, columns, values = zip(*items)
+            table = pa.table({
+                "row": pa.array(rows, pa.int64()),
+                "column": pa.array(columns, pa.string()).dictionary_encode(),
+                "value": pa.array(values, pa.string()),
+            })
+            pq.write_table(table, os.path.join(
+                self.spill_dir, f"block_{sheet_id:04d}_{block:08d}_{self._part:06d}.parquet"
+            ))
+        self._part += 1
+        self._buffer = {}
+        self._buffered_bytes = 0
+
+    def _load_block(self, sheet_id, block):
+        """读取单个行块的全部分片（不含缓冲区）"""
+        results = {}
+        pattern = os.path.join(self.spill_dir, f"block_{sheet_id:04d}_{block:08d}_*.parquet")
+        for path in sorted(glob.glob(pattern)):
+            if self._max_part is not None and int(path[-14:-8]) >= self._max_part:
+                continue
+            table = pq.read_table(path).to_pydict()
+            for row_idx, column, value in zip(table["row"], table["column"], table["value"]):
+                results[(row_idx, column)] = value
+        return results
+
+    def _write_sheet(self, ws_in, ws_out, sheet_id, target_columns):
+        """流式写出一个工作表，按行块合并溢写的译文"""
+        rows = iter_sheet_rows(ws_in)
+        header = next(rows, [])
+        columns = header + [c for c in target_columns if c not in header]
+        ordered = sort_result_columns(columns) if columns else columns
+        ws_out.append(ordered)
+
+        positions = {c: i for i, c in enumerate(header)}
+        block, block_results = -1, {}
+        for row_idx, row in enumerate(rows):
+            if row_idx // self.block_rows != block:
+                block = row_idx // self.block_rows
+                block_results = self._load_block(sheet_id, block)
+
+            values = []
+            for column in ordered:
+                value = block_results.get((row_idx, column))
+                if value is None and column in positions:
+                    value = row[positions[column]]
+                values.append(value)
+            ws_out.append(values)
+
+    def read_rows(self, segment, start, stop, columns):
+        """读取工作表第 start~stop 行的指定列（已溢写的分片加上缓冲区中的译文）"""
+        sheet_id = self.sheet_ids[segment.sheet]
+        results = {}
+        with self._lock:
+            for block in range(start // self.block_rows, (max(stop, start + 1) - 1) // self.block_rows + 1):
+                results.update(self._load_block(sheet_id, block))
+                for row_idx, column, value in self._buffer.get((sheet_id, block), ()):
+                    results[(row_idx, column)] = value
+        return [[results.get((row_idx, c)) for row_idx in range(start, stop)] for c in columns]
+
+    def snapshot(self):
+        """写出缓冲区后冻结分片编号，快照保存时不会读到之后写入的分片"""
+        with self._lock:
+            self._flush()
+            snap = copy.copy(self)
+            snap._max_part = self._part
+        snap._buffer = {}
+        snap._lock = threading.Lock()
+        return snap
+
+    def save(self, output_path):
+        with self._lock:
+            self._flush()
+
+        wb_in = openpyxl.load_workbook(self.input_path, read_only=True)
+        wb_out = openpyxl.Workbook(write_only=True)
+        try:
+            for name in wb_in.sheetnames:
+                ws_out = wb_out.create_sheet(title=name)
+                if name in self.sheet_ids:
+                    self._write_sheet(wb_in[name], ws_out, self.sheet_ids[name], self.target_columns[name])
+                else:
+                    for row in wb_in[name].iter_rows(values_only=True):
+                        ws_out.append(row)  # 未选中的工作表原样写回
+
+            # 先写入临时文件，支持覆盖输入文件本身（修复模式）
+            fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=self.spill_dir)
+            os.close(fd)
+            wb_out.save(tmp_path)
+        finally:
+            wb_in.close()
+        shutil.move(tmp_path, output_path)
+
+    def close(self):
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+JsonCodec = namedtuple("JsonCodec", ["name", "dumps", "dumps_text", "loads"])
+
+
+def json_codec(fast):
+    """返回请求/响应使用的 JSON 编解码函数；加速模式且安装了 orjson 时使用 orjson"""
+    if fast and orjson is not None:
+        return JsonCodec("orjson", orjson.dumps, lambda obj: orjson.dumps(obj).decode("utf-8"), orjson.loads)
+    def dumps_text(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))  # 紧凑格式，中文不转义
+
+    return JsonCodec("json", lambda obj: dumps_text(obj).encode("utf-8"), dumps_text, json.loads)
+
+
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+EncodedRequest = namedtuple("EncodedRequest", ["body", "raw_size", "encoding"])
+
+
+def decompress_body(raw, encoding):
+    """按 Content-Encoding 解压响应体（会话关闭了自动解压，以便统计实际传输字节）"""
+    encoding = (encoding or "").strip().lower()
+    if not encoding or encoding == "identity":
+        return raw
+    if encoding == "gzip":
+        return gzip.decompress(raw)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(raw)
+        except zlib.error:
+            return zlib.decompress(raw, -zlib.MAX_WBITS)  # 不带 zlib 头的 deflate
+    if encoding == "br" and brotli is not None:
+        return brotli.decompress(raw)
+    raise ValueError(f"不支持的响应压缩格式: {encoding}")
+
+
+def new_event_loop(fast):
+    """创建事件循环；加速模式且可用时使用 uvloop"""
+    if fast and uvloop is not None and sys.platform != "win32":
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+def describe_fast_path(fast):
+    """加速模式的实际生效情况（用于日志）"""
+    if not fast:
+        return "未开启"
+    loop_name = "uvloop" if uvloop is not None and sys.platform != "win32" else "asyncio（uvloop 未安装或不支持当前系统）"
+    codec_name = "orjson" if orjson is not None else "json（orjson 未安装）"
+    return f"事件循环 {loop_name} | JSON {codec_name}"
+
+
+class RunProfiler:
+    """性能分析模式：记录函数耗时、各协程的实际耗时，以及每个阶段结束时的内存快照
+
+    安装了 yappi 时按实际耗时（含等待）统计所有线程的函数，否则用 cProfile 统计翻译线程。
+    协程耗时通过事件循环的任务工厂记录：每个任务从创建到完成的时间按协程名汇总。
+    """
+
+    TOP_N = 10
+    TRACEMALLOC_FRAMES = 5
+
+    def __init__(self, output_prefix):
+        self.output_prefix = output_prefix
+        self.profile = None
+        self.tasks = {}  # 协程名 -> [任务数, 总耗时]
+        self.phases = []  # (阶段, 耗时, 当前内存, 峰值内存, 分配最多的代码行)
+        self.started = self.phase_started = 0.0
+
+    def start(self, loop):
+        tracemalloc.start(self.TRACEMALLOC_FRAMES)
+        if yappi is not None:
+            yappi.set_clock_type("wall")
+            yappi.start()
+        else:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        loop.set_task_factory(self._task_factory)
+        self.started = self.phase_started = time.perf_counter()
+
+    def _task_factory(self, loop, coro, **kwargs):
+        task = asyncio.Task(coro, loop=loop, **kwargs)
+        name = getattr(coro, "__qualname__", type(coro).__name__)
+        created = time.perf_counter()
+
+        def done(_):
+            entry = self.tasks.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += time.perf_counter() - created
+
+        task.add_done_callback(done)
+        return task
+
+    def phase(self, name):
+        """记录一个阶段结束时的耗时和内存快照"""
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        top = snapshot.statistics("lineno")[:3]
+        now = time.perf_counter()
+        self.phases.append((name, now - self.phase_started, current, peak, top))
+        self.phase_started = now
+        tracemalloc.reset_peak()
+
+    def stop(self):
+        """停止分析并写出文件，返回用于日志的摘要行"""
+        if yappi is not None:
+            yappi.stop()
+            profile_path = f"{self.output_prefix}_profile.prof"
+            yappi.get_func_stats().save(profile_path, type="pstat")
+            yappi.clear_stats()
+        else:
+            self.profile.disable()
+            profile_path = f"{self.output_prefix}_profile.prof"
+            self.profile.dump_stats(profile_path)
+        tracemalloc.stop()
+
+        stream = io.StringIO()
+        pstats.Stats(profile_path, stream=stream).sort_stats("cumulative").print_stats(self.TOP_N * 3)
+        stats = pstats.Stats(profile_path)
+        # 日志中略去事件循环本身的调度函数，完整结果见输出文件
+        functions = sorted(
+            (item for item in stats.stats.items() if "asyncio" not in item[0][0] and item[0][0] != "~"),
+            key=lambda item: item[1][3], reverse=True
+        )
+
+        lines = [f"=== 性能分析（{'yappi 实际耗时' if yappi is not None else 'cProfile'}，总用时 "
+                 f"{time.perf_counter() - self.started:.1f}s）==="]
+        lines.append("阶段: " + " | ".join(
+            f"{name} {seconds:.1f}s 内存 {current / 2**20:.0f}MB 峰值 {peak / 2**20:.0f}MB"
+            for name, seconds, current, peak, _ in self.phases
+        ))
+        lines.append(f"累计耗时最多的函数（前{self.TOP_N}）:")
+        for (filename, lineno, func), (cc, nc, tt, ct, callers) in functions[:self.TOP_N]:
+            lines.append(f"  {ct:8.2f}s  {nc:>8} 次  {func} ({os.path.basename(filename)}:{lineno})")
+        lines.append(f"协程实际耗时（按任务汇总，前{self.TOP_N}）:")
+        for name, (count, total) in sorted(self.tasks.items(), key=lambda item: item[1][1], reverse=True)[:self.TOP_N]:
+            lines.append(f"  {total:8.2f}s  {count:>8} 个任务  平均 {total / count * 1000:.1f}ms  {name}")
+
+        report_path = f"{self.output_prefix}_profile.txt"
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n\n")
+            for name, seconds, current, peak, top in self.phases:
+                f.write(f"[{name}] 分配最多的代码行:\n")
+                for stat in top:
+                    f.write(f"  {stat}\n")
+            f.write("\n" + stream.getvalue())
+        lines.append(f"性能分析结果已保存: {os.path.basename(profile_path)}（snakeviz 等工具可查看）, "
+                     f"{os.path.basename(report_path)}")
+        return lines
+
+
+class LoopLagMonitor:
+    """事件循环延迟探针：定时测量调度延迟，阻塞超过阈值时记录阻塞代码的调用栈
+
+    探针协程每 INTERVAL 秒醒来一次，实际醒来时间与预期之差即调度延迟；
+    另起一个监视线程检查探针心跳，循环被同步代码卡住时抓取事件循环线程当前的调用栈。
+    """
+
+    INTERVAL = 0.05
+    STACK_DEPTH = 8
+
+    def __init__(self, threshold_ms, report):
+        self.threshold = threshold_ms / 1000
+        self.report = report  # 回调：report(消息)
+        self.lags = []
+        self.stalls = 0
+        self._heartbeat = time.perf_counter()
+        self._running = False
+        self._task = None
+
+    async def _probe(self):
+        while self._running:
+            expected = time.perf_counter() + self.INTERVAL
+            await asyncio.sleep(self.INTERVAL)
+            now = time.perf_counter()
+            self.lags.append(max(0.0, now - expected))
+            self._heartbeat = now
+
+    def _watch(self, thread_id):
+        reported = None
+        while self._running:
+            time.sleep(self.threshold / 2)
+            heartbeat = self._heartbeat
+            blocked = time.perf_counter() - heartbeat - self.INTERVAL
+            if not self._running or blocked <= self.threshold or reported == heartbeat:
+                continue
+            reported = heartbeat  # 同一次阻塞只报告一次
+            self.stalls += 1
+            frame = sys._current_frames().get(thread_id)
+            stack = "".join(traceback.format_stack(frame, limit=self.STACK_DEPTH)).rstrip() if frame else ""
+            self.report(f"事件循环阻塞超过 {blocked * 1000:.0f}ms，阻塞位置:\n{stack}")
+
+    def start(self):
+        """在事件循环线程中调用"""
+        self._running = True
+        self._heartbeat = time.perf_counter()
+        self._task = asyncio.ensure_future(self._probe())
+        threading.Thread(target=self._watch, args=(threading.get_ident(),), daemon=True).start()
+
+    def stop(self):
+        self._running = False
+        if self._task is not None:
+            self._task.cancel()
+
+    def summary(self):
+        """返回 (P50, P95, P99, 最大值) 毫秒，无样本时返回 None"""
+        if not self.lags:
+            return None
+        lags = np.array(self.lags) * 1000
+        p50, p95, p99 = np.percentile(lags, [50, 95, 99])
+        return p50, p95, p99, float(lags.max())
+
+
+class ChromeTracer:
+    """记录每个请求各阶段的时间段，导出为 Chrome trace-event JSON
+
+    导出文件可在 Perfetto (ui.perfetto.dev) 或 chrome://tracing 中打开。每个占用中的并发槽是一条时间线，
+    等待并发槽的时间记录为异步事件，事件循环上的结果写入记录在第 0 条时间线。
+    """
+
+    MAX_EVENTS = 2_000_000  # 超过后不再记录，避免超大任务占用过多内存
+
+    def __init__(self):
+        self.events = []
+        self.origin = time.perf_counter()
+        self._free_lanes = []
+        self._lanes = 0
+        self._ids = 0
+        self.dropped = 0
+
+    def now(self):
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def next_id(self):
+        self._ids += 1
+        return self._ids
+
+    def acquire_lane(self):
+        """分配一个空闲的时间线编号（对应一个占用中的并发槽）"""
+        if self._free_lanes:
+            return heapq.heappop(self._free_lanes)
+        self._lanes += 1
+        return self._lanes
+
+    def release_lane(self, lane):
+        heapq.heappush(self._free_lanes, lane)
+
+    def _add(self, event):
+        if len(self.events) >= self.MAX_EVENTS:
+            self.dropped += 1
+            return
+        self.events.append(event)
+
+    def complete(self, name, cat, start, lane, **args):
+        """记录一个从 start（微秒）到现在的时间段"""
+        self._add({"name": name, "cat": cat, "ph": "X", "ts": start, "dur": self.now() - start,
+                   "pid": 1, "tid": lane, "args": args})
+
+    def wait(self, name, cat, start, span_id, **args):
+        """记录一段等待（异步事件，不占用时间线）"""
+        self._add({"name": name, "cat": cat, "ph": "b", "ts": start, "id": span_id, "pid": 1, "args": args})
+        self._add({"name": name, "cat": cat, "ph": "e", "ts": self.now(), "id": span_id, "pid": 1})
+
+    def save(self, path):
+        names = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": "事件循环"}}]
+        names += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": lane, "args": {"name": f"并发槽 {lane}"}}
+                  for lane in range(1, self._lanes + 1)]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": names + self.events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+
+class NullTracer:
+    """未开启时间线记录时使用，所有记录操作为空"""
+
+    def now(self):
+        return 0.0
+
+    def next_id(self):
+        return 0
+
+    def acquire_lane(self):
+        return 0
+
+    def release_lane(self, lane):
+        pass
+
+    def complete(self, name, cat, start, lane, **args):
+        pass
+
+    def wait(self, name, cat, start, span_id, **args):
+        pass
+
+
+class TranslationAPI:
+    """翻译接口客户端：多接口负载均衡、对冲请求和耗时统计（翻译任务与本地翻译服务共用）"""
+
+    def __init__(self, api_config, endpoints=None, fast=None):
+        self.endpoints = EndpointPool(endpoints or api_config.endpoints)  # 各接口的并发控制和速率限制
+        self.capacity = self.endpoints.capacity
+        self.codec = json_codec(api_config.fast_path if fast is None else fast)
+        self.compress = api_config.request_compression
+        self.compress_min_bytes = api_config.compress_min_bytes
+        self.timeout_factor = api_config.request_timeout_factor
+        self.deadline = None  # 任务时限（time.time() 时间戳），请求超时不会超过它
+        self.latency_model = LatencyModel(api_config.data_dir / "latency_model.json")
+        self.hedge = HedgePolicy(api_config.hedge_percentile, api_config.hedge_max_ratio)
+        self.metrics = Counter()
+        self.tracer = NullTracer()
+
+    def new_session(self):
+        """创建HTTP会话：声明可接收压缩响应，并关闭自动解压以统计实际传输字节"""
+        return aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=None, connect=CONNECT_TIMEOUT, sock_read=DEFAULT_TIMEOUT),
+            json_serialize=self.codec.dumps_text,
+            headers={"Accept-Encoding": ACCEPT_ENCODING},
+            auto_decompress=False
+        )
+
+    def request_timeout(self, lang_code, chars):
+        """按原文长度和该语言近期耗时计算单个请求的超时（连接与读取分开）
+
+        耗时模型样本不足时不低于 DEFAULT_TIMEOUT；设置了任务时限时不超过剩余时间。
+        """
+        estimate = self.latency_model.estimate(lang_code, chars)
+        read = estimate * self.timeout_factor + TIMEOUT_MARGIN
+        if not self.latency_model.is_trained(lang_code):
+            read = max(read, DEFAULT_TIMEOUT)
+        read = min(max(read, MIN_REQUEST_TIMEOUT), MAX_REQUEST_TIMEOUT)
+        if self.deadline is not None:
+            read = max(1.0, min(read, self.deadline - time.time()))
+        return aiohttp.ClientTimeout(total=None, connect=min(CONNECT_TIMEOUT, read), sock_read=read)
+
+    def encode(self, payload):
+        """编码请求体，较大的请求体按配置用 gzip 压缩"""
+        body = self.codec.dumps(payload)
+        if self.compress and len(body) >= self.compress_min_bytes:
+            return EncodedRequest(gzip.compress(body, compresslevel=5), len(body), "gzip")
+        return EncodedRequest(body, len(body), None)
+
+    async def translate(self, session, text, source_lang, target_lang, glossary=""):
+        """发送翻译请求；请求超过对冲阈值仍未返回时补发一个副本，先返回者胜出"""
+        lang_code = target_lang
+
+        if target_lang == 'UK':
+            target_lang = "乌克兰语"
+        
+        payload = {
+            "inputs": {
+                "source_lang": source_lang,
+                "target_lang": target_lang,
+                "query": text
+            },
+            "response_mode": "blocking",
+            "user": "pyqt_translation_tool_thread"
+        }
+
+        if glossary:
+            payload["inputs"]["glossary"] = glossary  # 术语约束
+        body = self.encode(payload)  # 只编码一次，重试和对冲副本复用
+
+        estimate = self.latency_model.estimate(lang_code, len(text))
+        self.hedge.requests += 1
+        started = asyncio.Event()
+        primary = asyncio.ensure_future(self._send_request(session, body, lang_code, len(text), estimate, started))
+        hedge = None
+        try:
+            threshold = self.hedge.threshold(estimate)
+            if threshold is None:
+                return await primary
+
+            # 主请求真正发出后才开始计时，排队等待并发槽的时间不计入
+            waiter = asyncio.ensure_future(started.wait())
+            await asyncio.wait({primary, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            done, _ = await asyncio.wait({primary}, timeout=threshold)
+            if done or not self.hedge.allow():
+                return await primary
+
+            self.metrics['hedges'] += 1
+            hedge = asyncio.ensure_future(
+                self._send_request(session, body, lang_code, len(text), estimate, asyncio.Event(), is_hedge=True)
+            )
+            racing = {primary, hedge}
+            while racing:
+                done, racing = await asyncio.wait(racing, return_when=asyncio.FIRST_COMPLETED)
+                for request in done:
+                    if request.exception() is None:
+                        if request is hedge:
+                            self.metrics['hedge_wins'] += 1
+                        return request.result()
+            return primary.result()  # 两个请求都失败，抛出主请求的错误
+        finally:
+            for request in (primary, hedge):
+                if request is not None and not request.done():
+                    request.cancel()
+
+    async def _send_request(self, session, body, lang_code, chars, estimate, started, is_hedge=False):
+        """发送一次请求：按负载选择接口（带并发控制和速率限制），接口故障时换一个接口重试一次"""
+        tracer = self.tracer
+        request_id = tracer.next_id()
+        failed_endpoint = None
+        attempts = 2 if len(self.endpoints.endpoints) > 1 else 1
+        for attempt in range(attempts):
+            queued = tracer.now()
+            endpoint = await self.endpoints.acquire(avoid=failed_endpoint)
+            lane = tracer.acquire_lane()
+            tracer.wait("等待并发槽", "queue", queued, request_id, lang=lang_code)
+            request_start = None
+            unhealthy = True
+            try:
+                # 速率限制
+                elapsed = time.time() - endpoint.last_request_time
+                if elapsed < endpoint.interval:
+                    span = tracer.now()
+                    await asyncio.sleep(endpoint.interval - elapsed)
+                    tracer.complete("速率限制等待", "ratelimit", span, lane)
+
+                endpoint.last_request_time = time.time()
+                request_start = time.time()
+                started.set()
+                span = tracer.now()
+                headers = endpoint.headers
+                if body.encoding:
+                    headers = {**headers, "Content-Encoding": body.encoding}
+                self.metrics['request_bytes'] += len(body.body)
+                self.metrics['request_raw_bytes'] += body.raw_size
+                timeout = self.request_timeout(lang_code, chars)
+                async with session.post(endpoint.url, data=body.body, headers=headers, timeout=timeout) as resp:
+                    tracer.complete(
+                        "HTTP 发送/等待响应", "http", span, lane, endpoint=endpoint.name, lang=lang_code,
+                        chars=chars, status=resp.status, hedge=is_hedge, attempt=attempt + 1, request=request_id
+                    )
+                    span = tracer.now()
+                    raw = await resp.read()
+                    tracer.complete("HTTP 接收响应", "http", span, lane, bytes=len(raw))
+                    self.metrics['response_bytes'] += len(raw)
+                    raw = decompress_body(raw, resp.headers.get("Content-Encoding"))
+                    self.metrics['response_raw_bytes'] += len(raw)
+                    if resp.status != 200:
+                        unhealthy = resp.status == 429 or resp.status >= 500
+                        error = self.codec.loads(raw)
+                        raise ValueError(f"API错误({resp.status}): {error.get('message', '未知错误')}")
+                    span = tracer.now()
+                    translated = self._parse_response(raw)
+                    tracer.complete("解析响应", "parse", span, lane)
+                latency = time.time() - request_start
+                self.endpoints.release(endpoint, latency, estimate)
+                self.latency_model.observe(lang_code, chars, latency)
+                self.hedge.observe(estimate, latency)
+                self.metrics['busy_seconds'] += latency
+                return translated
+            except asyncio.CancelledError:
+                self.endpoints.release(endpoint)
+                if request_start is not None:
+                    # 被取消的请求（对冲输给另一副本）耗时不完整，只计入占用时间，不更新延迟统计
+                    self.metrics['busy_seconds'] += time.time() - request_start
+                raise
+            except Exception as e:
+                self.endpoints.release(endpoint, unhealthy=unhealthy)
+                if isinstance(e, asyncio.TimeoutError):
+                    self.metrics['timeouts'] += 1
+                    e = f"超时（读取 {timeout.sock_read:.0f}s）"
+                if not unhealthy or attempt == attempts - 1:
+                    raise ValueError(f"请求失败: {str(e)}")
+                failed_endpoint = endpoint
+                self.metrics['failovers'] += 1
+            finally:
+                tracer.release_lane(lane)
+
+    def _parse_response(self, raw):
+        """解析API响应"""
+        data = self.codec.loads(raw)
+        return data.get("data", {}).get("outputs", {}).get("text", "")
+
+
+class TranslationThread(QThread):
+    """异步翻译线程（支持真正并发）"""
+    progress_updated = pyqtSignal(int, str)  # (进度百分比, 日志消息)
+    finished = pyqtSignal(bool, str)  # (是否成功, 结果消息)
+
+    def __init__(self, params):
+        super().__init__()
+        self.api_config = get_api_config()  # 加载配置
+        self.API_KEY = self.api_config.key
+        self.API_URL = self.api_config.url
+        self.api = TranslationAPI(self.api_config)
+        self.endpoints = self.api.endpoints
+        self.latency_model = self.api.latency_model
+        self.hedge = self.api.hedge
+        self.MAX_CONCURRENT_REQUESTS = self.api.capacity
+        self.daemon_url = None
+        self.tracer = NullTracer()
+        self.profiler = None
+        self.loop_monitor = None
+        self.deadline = None
+
+        self.params = params
+        self._is_running = True
+        self.completed_tasks = 0  # 将计数器移到类成员变量
+        self.failed_tasks = 0
+        self.metrics = Counter()
+        self.inflight = 0  # 进行中的翻译任务数（仪表盘读取）
+        self.estimate = None
+        self.preview = None  # (文本序列, 文本来源, 结果存储, 目标语言)，供界面预览进行中的结果
+        self.started_at = None
+        self.cache = None
+        self.glossary = None
+        self.segments = []
+        self.segment_offsets = []
+        self.segment_max_chars = self.api_config.segment_max_chars
+        self._piece_tasks = {}
+
+    def run(self):
+        try:
+            loop = new_event_loop(self.api_config.fast_path)
+            asyncio.set_event_loop(loop)
+            if self.params.get('profile'):
+                self.profiler = RunProfiler(os.path.splitext(self.params['output_path'])[0])
+                self.profiler.start(loop)
+            loop.run_until_complete(self._run_translation())
+        except Exception as e:
+            self.progress_updated.emit(0, f"严重错误: {str(e)}")
+            self.finished.emit(False, str(e))
+        finally:
+            if 'loop' in locals():
+                loop.close()
+            if self.profiler is not None:
+                try:
+                    for line in self.profiler.stop():
+                        self.progress_updated.emit(100, line)
+                except Exception as e:
+                    self.progress_updated.emit(100, f"性能分析结果保存失败: {str(e)}")
+                self.profiler = None
+
+    def metrics_snapshot(self):
+        """供界面定时读取的汇总指标（只读几个计数，不加锁，不影响翻译线程）"""
+        m = self.metrics
+        return {
+            'elapsed': time.time() - self.started_at if self.started_at else 0.0,
+            'total': m.get('pending_cells', 0),
+            'completed': self.completed_tasks,
+            'failed': self.failed_tasks,
+            'requests': m.get('api_requests', 0),
+            'cache_hits': m.get('cache_hits', 0),
+            'inflight': self.inflight,
+        }
+
+    def _phase(self, name):
+        """性能分析模式下记录阶段结束时的内存快照"""
+        if self.profiler is not None:
+            self.profiler.phase(name)
+
+    async def _run_translation(self):
+        """执行翻译的核心异步函数"""
+        input_path = self.params['input_path']
+        output_path = self.params['output_path']
+        text_columns = split_names(self.params.get('text_columns') or self.params['text_column'])
+        sheets = split_names(self.params.get('sheets'))
+        source_lang = self.params['source_lang']
+        target_langs = self.params['target_langs']
+        low_memory = self.params.get('low_memory', False)
+        previous_path = self.params.get('previous_path')
+        key_column = self.params.get('key_column') or None
+        repair = self.params.get('repair', False)
+        priority_langs = [code for code in split_names(self.params.get('priority_langs')) if code in target_langs]
+        deadline_minutes = self.params.get('deadline_minutes') or 0
+        deadline = time.time() + deadline_minutes * 60 if deadline_minutes > 0 else None  # 从任务开始计时
+
+        # 1. 读取输入文件
+        try:
+            frames, segments, texts, skipped_columns = read_job_input(
+                input_path, sheets, text_columns, low_memory,
+                job_extra_columns(text_columns, target_langs, key_column, repair)
+            )
+            self.progress_updated.emit(5, f"成功读取文件: {os.path.basename(input_path)}")
+            if len(segments) > 1:
+                self.progress_updated.emit(
+                    5, "文本来源: " + " | ".join(f"{seg.sheet}[{seg.column}] {seg.length}行" for seg in segments)
+                )
+            if skipped_columns:
+                self.progress_updated.emit(5, f"以下工作表缺少文本列，已跳过: {', '.join(skipped_columns)}")
+            self._phase("读取")
+        except Exception as e:
+            self.progress_updated.emit(0, f"文件读取失败: {str(e)}")
+            self.finished.emit(False, f"文件错误: {str(e)}")
+            return
+
+        # 2. 准备结果存储
+        if low_memory:
+            store = SpillResultStore(
+                input_path, segments, target_langs, self.params.get('memory_budget_mb', DEFAULT_MEMORY_BUDGET_MB)
+            )
+            self.progress_updated.emit(5, f"低内存模式: 行块大小 {store.block_rows}, 临时目录 {store.spill_dir}")
+        else:
+            store = DataFrameResultStore(frames, segments)
+        self.preview = (texts, segments, store, target_langs)
+        self.segments = segments
+        self.segment_offsets = [seg.offset for seg in segments]
+        total_rows = len(texts)
+        total_cells = total_rows * len(target_langs)
+        self.metrics = Counter(total_cells=total_cells)
+        self.api.metrics = self.metrics
+        self.api.deadline = self.deadline = deadline
+        self.tracer = ChromeTracer() if self.params.get('trace') else NullTracer()
+        self.api.tracer = self.tracer
+        start_time = self.started_at = time.time()
+
+        # 每种语言一个待翻译掩码（按全局位置），复用/跳过的单元格置为 False
+        pending = {code: np.ones(total_rows, dtype=bool) for code in target_langs}
+
+        # 增量更新：复用上一版译文，只翻译新增或变更的单元格
+        if previous_path:
+            try:
+                self._apply_previous_translations(
+                    frames, segments, store, pending, previous_path, key_column
+                )
+            except Exception as e:
+                store.close()
+                self.progress_updated.emit(0, f"上一版译文读取失败: {str(e)}")
+                self.finished.emit(False, f"增量更新失败: {str(e)}")
+                return
+
+        # 修复模式：输入即上一次的输出文件，保留有效译文
+        if repair:
+            kept = self._mark_valid_cells(frames, segments, pending)
+            self.metrics['repair_cells'] = count_pending(pending)
+            self.progress_updated.emit(
+                5, f"修复模式: 保留有效单元格 {kept} | 待修复单元格 {self.metrics['repair_cells']}"
+            )
+
+        # 预过滤：空值、数字、编号等无需翻译的单元格直接写入结果
+        if self.params.get('prefilter', True):
+            self._apply_prefilter(texts, store, pending, source_lang)
+
+        # 术语表：整格命中术语的单元格直接使用术语译文
+        self.glossary = None
+        glossary_path = self.params.get('glossary_path')
+        if glossary_path:
+            try:
+                self.glossary = GlossaryIndex.load(glossary_path, self.api_config.data_dir)
+                self._apply_glossary(texts, store, pending)
+            except Exception as e:
+                store.close()
+                self.progress_updated.emit(0, f"术语表加载失败: {str(e)}")
+                self.finished.emit(False, f"术语表错误: {str(e)}")
+                return
+
+        # 相似文本合并：所有工作表/列的文本一起按（掩码后的）模板分组，同一模板每种语言只请求一次
+        mask_placeholders = self.params.get('mask_placeholders', True)
+        groups = self._group_by_template(texts, pending, mask_placeholders)
+
+        total_tasks = count_pending(pending)
+        self.metrics['pending_cells'] = total_tasks
+        self.completed_tasks = 0  # 重置计数器
+        self.failed_tasks = 0
+        self._piece_tasks = {}
+
+        self.cache = None
+        if self.params.get('use_cache', True):
+            try:
+                self.cache = TranslationMemory(self.api_config.cache_path)
+            except Exception as e:
+                self.progress_updated.emit(5, f"翻译缓存不可用，本次不使用缓存: {str(e)}")
+
+        try:
+            # 3. 创建HTTP会话并执行并发任务
+            async with self.api.new_session() as session:
+                if self.api_config.fast_path:
+                    self.progress_updated.emit(5, f"加速模式: {describe_fast_path(True)}")
+                self.daemon_url = await self._connect_daemon(session)
+                if self.daemon_url and self.cache is not None:
+                    self.cache.commit_every = 1  # 本地翻译服务可能写同一个缓存文件，不长时间占用写锁
+                if self.api_config.loop_stall_ms > 0:
+                    self.loop_monitor = LoopLagMonitor(
+                        self.api_config.loop_stall_ms,
+                        lambda message: self.progress_updated.emit(int(self.completed_tasks / max(total_tasks, 1) * 100), message)
+                    )
+                    self.loop_monitor.start()
+
+                # 先查缓存，再按调度策略排列各语言队列的请求顺序
+                cached = self._lookup_cache(groups, source_lang, target_langs)
+                queues = self._schedule(groups, target_langs, cached)
+                self.estimate = estimate_job(
+                    groups, cached, source_lang, target_langs, self.latency_model, self.endpoints,
+                    self.segment_max_chars, pending
+                )
+                for line in format_estimate(self.estimate):
+                    self.progress_updated.emit(5, line)
+                self._phase("调度")
+
+                # 按需生成任务，避免百万行时一次性创建全部协程
+                def iter_tasks(lang_code):
+                    for template in queues[lang_code]:
+                        rows = np.frombuffer(groups[template], dtype=np.uint32)
+                        lang_rows = rows[pending[lang_code][rows]].tolist()
+                        if not lang_rows:
+                            continue
+                        yield self._create_translation_task(
+                            session, store, texts, template, lang_rows, source_lang, lang_code,
+                            total_tasks, cached.get(template, {}).get(lang_code), mask_placeholders
+                        )
+
+                # 优先语言全部完成后提前保存一份结果
+                early_save = None
+
+                def on_priority_done():
+                    nonlocal early_save
+                    stem, ext = os.path.splitext(output_path)
+                    early_path = f"{stem}_优先语言{ext or '.xlsx'}"
+                    early_save = (early_path, asyncio.get_running_loop().run_in_executor(
+                        None, store.snapshot().save, early_path
+                    ))
+
+                translate_start = time.time()
+                await self._dispatch_by_language(
+                    {code: iter_tasks(code) for code in target_langs}, priority_langs,
+                    on_priority_done if priority_langs and len(priority_langs) < len(target_langs) else None
+                )
+                self.metrics['translate_seconds'] = time.time() - translate_start
+                if self.loop_monitor is not None:
+                    self.loop_monitor.stop()
+                self._phase("翻译")
+                if early_save is not None:
+                    try:
+                        await early_save[1]
+                        self.progress_updated.emit(
+                            100, f"优先语言已提前保存到: {os.path.basename(early_save[0])}"
+                        )
+                    except Exception as e:
+                        self.progress_updated.emit(100, f"优先语言提前保存失败: {str(e)}")
+
+            # 4. 保存结果
+            try:
+                store.save(output_path)
+                self._phase("写入")
+                if repair:
+                    self.progress_updated.emit(100, self._repair_summary(total_tasks))
+                self._log_summary(time.time() - start_time)
+                if isinstance(self.tracer, ChromeTracer):
+                    trace_path = f"{os.path.splitext(output_path)[0]}_trace.json"
+                    self.tracer.save(trace_path)
+                    self.progress_updated.emit(
+                        100, f"请求时间线已导出: {os.path.basename(trace_path)}（可在 ui.perfetto.dev 或 chrome://tracing 中打开）"
+                    )
+                self.progress_updated.emit(100, f"翻译完成! 结果已保存到: {os.path.basename(output_path)}")
+                self.finished.emit(True, output_path)
+            except Exception as e:
+                self.finished.emit(False, f"文件保存失败: {str(e)}")
+        finally:
+            if self.loop_monitor is not None:
+                self.loop_monitor.stop()
+            store.close()
+            self.latency_model.save()
+            if self.cache is not None:
+                self.cache.close()
+
+    def _row_label(self, pos):
+        """日志中的行描述：单一文本来源显示 行/总行数，多来源时加上工作表和列名"""
+        segment, row_idx = locate_segment(self.segments, self.segment_offsets, pos)
+        if len(self.segments) == 1:
+            return f"{row_idx + 1}/{segment.length}行"
+        return f"{segment.sheet}[{segment.column}] {row_idx + 1}/{segment.length}行"
+
+    def _group_by_template(self, texts, pending, mask_placeholders):
+        """把仍需翻译的行按模板分组：{模板: [全局位置, ...]}"""
+        if not pending:
+            return {}
+        needed = np.logical_or.reduce(list(pending.values()))
+        groups = group_by_template(texts, needed, mask_placeholders)
+
+        self.metrics['unique_templates'] = len(groups)
+        self.metrics['pending_rows'] = int(needed.sum())
+        return groups
+
+    def _lookup_cache(self, groups, source_lang, target_langs):
+        """批量查询缓存，返回 {模板: {语言代码: 译文}}（只包含命中的模板）"""
+        if self.cache is None:
+            return {}
+        cached = {}
+        for template in groups:
+            hits = lookup_cached(self.cache, self.glossary, template, source_lang, target_langs)
+            if hits:
+                cached[template] = hits
+        return cached
+
+    def _schedule(self, groups, target_langs, cached):
+        """返回 {语言代码: 模板迭代器}，即各语言队列的请求顺序
+
+        缓存命中的请求最先处理；其余按预计耗时（原文长度 × 各语言历史耗时）从长到短排列，
+        让长文本尽早开始，减少任务末尾少数长请求拖慢整体的情况。
+        """
+        templates = list(groups)
+        if not templates or not target_langs:
+            return {code: iter(()) for code in target_langs}
+        coeffs = np.array([self.latency_model.coefficients(code) for code in target_langs], dtype=np.float32)
+        lengths = np.fromiter((len(t) for t in templates), dtype=np.float32, count=len(templates))
+        costs = coeffs[:, 0][None, :] + coeffs[:, 1][None, :] * lengths[:, None]  # (模板数, 语言数)
+        for g, template in enumerate(templates):
+            for code in cached.get(template, ()):
+                costs[g, target_langs.index(code)] = 0.0
+
+        flat = costs.ravel()
+        policy = self.api_config.schedule_policy
+        workers = self.MAX_CONCURRENT_REQUESTS
+        if policy == "fifo":
+            order = np.arange(flat.size)
+        elif flat.size <= SCHEDULE_FULL_SORT_LIMIT:
+            key = np.where(flat == 0.0, -np.inf, -flat)  # 缓存命中排在最前
+            order = np.argsort(key, kind="stable")
+        else:
+            # 请求过多时按模板整体排序，同一模板内慢语言优先
+            template_order = np.argsort(-costs.max(axis=1), kind="stable")
+            lang_order = np.argsort(-(coeffs[:, 0] + coeffs[:, 1] * float(lengths.mean())), kind="stable")
+            order = (template_order[:, None] * len(target_langs) + lang_order[None, :]).ravel()
+
+        # 对比按行顺序与当前策略的预计总用时（近似值：按共用的并发槽模拟，未计入各语言的并发额度）
+        busy = float(flat.sum())
+        if flat.size <= MAKESPAN_SIMULATION_LIMIT:
+            fifo_makespan = estimate_makespan(flat, workers)
+            planned_makespan = estimate_makespan(flat[order], workers)
+        else:
+            fifo_makespan = planned_makespan = max(busy / workers, float(flat.max()))
+        self.metrics['makespan_fifo'] = fifo_makespan
+        self.metrics['makespan_planned'] = planned_makespan
+        self.progress_updated.emit(
+            5,
+            f"调度({policy}): 预计用时 按行顺序 {fifo_makespan:.1f}s -> 当前顺序 {planned_makespan:.1f}s | "
+            f"理论下界 {max(busy / workers, float(flat.max())):.1f}s (并发 {workers})"
+        )
+
+        n_langs = len(target_langs)
+        return {
+            code: (templates[k] for k in (order[order % n_langs == i] // n_langs).tolist())
+            for i, code in enumerate(target_langs)
+        }
+
+    def _mark_valid_cells(self, frames, segments, pending):
+        """修复模式：已有有效译文的单元格不再翻译，返回保留数量"""
+        kept = mark_valid_cells(frames, segments, pending)
+        self.metrics['kept_cells'] += kept
+        return kept
+
+    def _apply_previous_translations(self, frames, segments, store, pending, previous_path, key_column):
+        """对比上一版输出文件，把可复用的译文写入结果并从待翻译中移除"""
+        added_rows, changed_rows, removed_rows, reused = reuse_previous_translations(
+            frames, segments, pending, previous_path, key_column, store.set
+        )
+        self.metrics['reused_cells'] += reused
+        self.progress_updated.emit(
+            5,
+            f"增量更新: 新增行 {added_rows} | 变更行 {changed_rows} | 删除行 {removed_rows} | "
+            f"复用单元格 {reused} | 待翻译单元格 {count_pending(pending)}"
+        )
+
+    def _apply_prefilter(self, texts, store, pending, source_lang):
+        """预过滤：按规则跳过无需翻译的单元格，原值直接写入（空值留空）"""
+        rules = self.params.get('prefilter_rules') or self.api_config.prefilter_rules
+        skips = apply_prefilter(texts, pending, rules, source_lang, self.api_config.sku_pattern, store.set)
+        for rule, count in skips.items():
+            self.metrics[f"skip_{rule}"] += count
+
+        skipped = sum(skips.values())
+        if skipped:
+            self.progress_updated.emit(5, f"预过滤: 跳过 {skipped} 个无需翻译的单元格")
+
+    def _apply_glossary(self, texts, store, pending):
+        """整格匹配术语表的单元格直接写入术语译文，不调用API"""
+        hits = apply_glossary(self.glossary, texts, pending, store.set)
+        self.metrics['glossary_hits'] += hits
+        self.progress_updated.emit(
+            5, f"术语表: {len(self.glossary.terms)} 条术语 | 整格命中 {hits} 个单元格"
+        )
+
+    def _repair_summary(self, total_tasks):
+        """修复结果：待修复单元格 = API重译 + 无需翻译直接填入 + 原文为空 + 仍失败 (+ 到时限未翻译)"""
+        m = self.metrics
+        empty = m['skip_empty']
+        direct = m['repair_cells'] - total_tasks - empty  # 预过滤、术语表直接填入
+        line = (
+            f"修复完成: 已修复 {self.completed_tasks + direct} 个单元格"
+            f"（API重译 {self.completed_tasks} | 无需翻译直接填入 {direct}）| "
+            f"原文为空留空 {empty} 个 | 仍失败 {self.failed_tasks} 个"
+        )
+        unfinished = total_tasks - self.completed_tasks - self.failed_tasks
+        if unfinished:
+            line += f" | 到时限未翻译 {unfinished} 个"
+        return line
+
+    def _log_summary(self, elapsed):
+        """输出任务摘要"""
+        m = self.metrics
+        lines = [
+            "=== 任务摘要 ===",
+            f"总单元格: {m['total_cells']} | 已翻译: {self.completed_tasks} | 失败: {self.failed_tasks} | 用时: {elapsed:.1f}s",
+        ]
+        if m['deadline_reached']:
+            lines.append(
+                f"已到任务时限: {m['pending_cells'] - self.completed_tasks - self.failed_tasks} 个单元格未翻译（留空），"
+                f"可稍后用修复模式补译"
+            )
+        if m['timeouts']:
+            lines.append(f"请求超时: {m['timeouts']} 次（按原文长度和各语言近期耗时计算超时）")
+        if m['pending_rows']:
+            lines.append(
+                f"请求合并: 待翻译行 {m['pending_rows']} -> 唯一模板 {m['unique_templates']} | "
+                f"API请求 {m['api_requests']} | 缓存命中 {m['cache_hits']} | 占位符回退 {m['mask_fallbacks']}"
+            )
+        if m['daemon_cache_hits']:
+            lines.append(f"本地翻译服务缓存命中: {m['daemon_cache_hits']}")
+        if m['request_bytes']:
+            lines.append(
+                f"流量: 请求 {m['request_bytes'] / 1024:.1f}KB (压缩前 {m['request_raw_bytes'] / 1024:.1f}KB) | "
+                f"响应 {m['response_bytes'] / 1024:.1f}KB (解压后 {m['response_raw_bytes'] / 1024:.1f}KB)"
+            )
+        if m['segmented_texts']:
+            lines.append(
+                f"长文本切分: {m['segmented_texts']} 段文本 -> {m['segments']} 个片段 | 片段缓存命中 {m['segment_cache_hits']}"
+            )
+        if m['translate_seconds'] and m['busy_seconds']:
+            ideal = m['busy_seconds'] / self.MAX_CONCURRENT_REQUESTS
+            lines.append(
+                f"调度: 翻译阶段实际 {m['translate_seconds']:.1f}s | 预计 按行顺序 {m['makespan_fifo']:.1f}s / "
+                f"当前顺序 {m['makespan_planned']:.1f}s | 请求总耗时/并发 {ideal:.1f}s | "
+                f"并发效率 {ideal / m['translate_seconds']:.0%}"
+            )
+        if self.estimate is not None and m['translate_seconds']:
+            est = self.estimate
+            lines.append(
+                f"预估对比: API请求 预估 {est['requests']} / 实际 {m['api_requests']} | "
+                f"原文字符 预估 {sum(est['chars'].values())} / 实际 {m['request_chars']} | "
+                f"翻译用时 预估 {format_duration(est['seconds'])} / 实际 {format_duration(m['translate_seconds'])}"
+            )
+        if m['hedges']:
+            lines.append(
+                f"对冲请求: 补发 {m['hedges']} ({m['hedges'] / max(m['api_requests'], 1):.1%}) | "
+                f"副本先返回 {m['hedge_wins']} | 阈值分位 P{self.hedge.percentile:g}"
+            )
+        if len(self.endpoints.endpoints) > 1:
+            for e in self.endpoints.endpoints:
+                avg = e.busy_seconds / max(e.requests - e.failures, 1)
+                lines.append(
+                    f"{e.name}: 请求 {e.requests} | 失败 {e.failures} | 平均耗时 {avg:.2f}s | "
+                    f"相对耗时 {e.slowness:.2f} | 剔除 {e.ejections} 次"
+                )
+            if m['failovers']:
+                lines.append(f"故障切换重试: {m['failovers']}")
+        lang_seconds = [(code, m[f'lang_seconds_{code}']) for code in TARGET_LANGUAGES if m[f'lang_seconds_{code}']]
+        if len(lang_seconds) > 1:
+            lines.append("各语言完成用时: " + " | ".join(f"{code} {sec:.1f}s" for code, sec in lang_seconds))
+        lag = self.loop_monitor.summary() if self.loop_monitor is not None else None
+        if lag is not None:
+            lines.append(
+                f"事件循环延迟: P50 {lag[0]:.1f}ms | P95 {lag[1]:.1f}ms | P99 {lag[2]:.1f}ms | 最大 {lag[3]:.0f}ms | "
+                f"阻塞超过 {self.loop_monitor.threshold * 1000:.0f}ms: {self.loop_monitor.stalls} 次"
+            )
+        if m['glossary_hits'] or m['glossary_constrained']:
+            lines.append(f"术语表: 整格命中 {m['glossary_hits']} | 带术语约束的请求 {m['glossary_constrained']}")
+        if m['reused_cells'] or m['kept_cells']:
+            lines.append(f"复用上一版译文: {m['reused_cells']} | 修复模式保留: {m['kept_cells']}")
+        skips = [f"{PREFILTER_RULE_NAMES[rule]} {m[f'skip_{rule}']}"
+                 for rule in PREFILTER_RULE_NAMES if m[f'skip_{rule}']]
+        if skips:
+            lines.append("预过滤跳过: " + " | ".join(skips))
+        for line in lines:
+            self.progress_updated.emit(100, line)
+
+    async def _dispatch_by_language(self, queues, priority_langs, on_priority_done=None):
+        """按语言分队列公平派发任务
+
+        每种语言有独立的并发额度（优先语言按 PRIORITY_LANG_WEIGHT 倍分配），慢语言不会占满全部并发；
+        某种语言的队列清空后，其额度分给仍在进行的语言。优先语言全部完成时调用 on_priority_done。
+        """
+        capacity = self.MAX_CONCURRENT_REQUESTS
+        queues = dict(queues)
+        priority = set(priority_langs)
+        inflight = Counter()
+        running = {}  # 任务 -> 语言代码
+        limits = {}
+        started = time.time()
+
+        def rebalance():
+            limits.update(split_capacity(
+                capacity, {code: PRIORITY_LANG_WEIGHT if code in priority else 1 for code in queues}
+            ))
+
+        def finish(code):
+            self.metrics[f'lang_seconds_{code}'] = time.time() - started
+            if code in priority and not any(c in priority for c in list(queues) + list(inflight)):
+                if on_priority_done is not None:
+                    on_priority_done()
+
+        rebalance()
+        while queues or running:
+            if not self._is_running:
+                for task in running:
+                    task.cancel()
+                raise Exception("用户取消操作")
+            if queues and self.deadline is not None and time.time() >= self.deadline - DEADLINE_MARGIN:
+                # 接近任务时限：不再派发新请求，等待已发出的请求结束
+                self.metrics['deadline_reached'] = 1
+                self.progress_updated.emit(
+                    int(self.completed_tasks / max(self.metrics['pending_cells'], 1) * 100),
+                    "已接近任务时限，停止派发新请求，等待进行中的请求完成"
+                )
+                queues.clear()
+                if not running:
+                    break
+            # 优先语言先补满额度，其余语言按已用额度比例从低到高补充
+            for code in sorted(queues, key=lambda c: (c not in priority, inflight[c] / max(limits[c], 1))):
+                while code in queues and inflight[code] < limits[code]:
+                    coro = next(queues[code], None)
+                    if coro is None:
+                        del queues[code]
+                        rebalance()
+                        if not inflight[code]:
+                            finish(code)
+                        break
+                    running[asyncio.ensure_future(coro)] = code
+                    inflight[code] += 1
+            if not running:
+                continue
+            self.inflight = len(running)
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                code = running.pop(task)
+                inflight[code] -= 1
+                if not inflight[code]:
+                    del inflight[code]
+                    if code not in queues:
+                        finish(code)
+            self.inflight = len(running)
+
+    def _create_translation_task(self, session, store, texts, template, rows, source_lang, lang_code,
+                                 total_tasks, cached=None, mask_placeholders=True):
+        """创建单个翻译任务：同一模板翻译一次，结果还原后写入所有对应行"""
+
+        async def task():
+            lang_name = TARGET_LANGUAGES[lang_code]
+            checked = 0  # 已还原或已归入回退的行数
+            fallback = {}  # 占位符未能完整保留的行：{原文: [全局位置, ...]}
+            try:
+                # 执行翻译（优先使用缓存）
+                if cached is not None:
+                    translated = cached
+                    self.metrics['cache_hits'] += 1
+                else:
+                    translated = await self._translate_text(session, template, source_lang, lang_code)
+
+                # 还原占位符并更新结果
+                span = self.tracer.now()
+                for row_idx in rows:
+                    text = str(texts.iat[row_idx])
+                    values = mask_text(text)[1] if mask_placeholders else ()
+                    result = restore_text(translated, values)
+                    if result is None:
+                        fallback.setdefault(text, []).append(row_idx)
+                    else:
+                        store.set(row_idx, lang_code, result)
+                    checked += 1
+
+                # 占位符未能完整保留，改为直接翻译原文：相同原文只请求一次，并发数由接口池限制
+                if fallback:
+                    self.metrics['mask_fallbacks'] += sum(len(group) for group in fallback.values())
+                    originals = list(fallback)
+                    results = await asyncio.gather(*(
+                        self._translate_text(session, text, source_lang, lang_code, use_cache=False)
+                        for text in originals
+                    ))
+                    for text, result in zip(originals, results):
+                        for row_idx in fallback.pop(text):
+                            store.set(row_idx, lang_code, result)
+                self.tracer.complete("写入结果", "write", span, 0, lang=lang_code, rows=len(rows))
+
+                # 更新进度（使用类成员变量）
+                self.completed_tasks += len(rows)
+                progress = int((self.completed_tasks / total_tasks) * 100)
+                self.progress_updated.emit(
+                    progress,
+                    f"进度: {self._row_label(rows[0])} | {lang_name} | 已完成: {progress}%"
+                )
+            except Exception as e:
+                failed_rows = [row_idx for group in fallback.values() for row_idx in group] + list(rows[checked:])
+                self.completed_tasks += len(rows) - len(failed_rows)
+                for row_idx in failed_rows:
+                    store.set(row_idx, lang_code, "[ERROR]")
+                self.failed_tasks += len(failed_rows)
+                self.progress_updated.emit(
+                    int((self.completed_tasks / total_tasks) * 100),
+                    f"错误: 行{self._row_label((failed_rows or rows)[0])} {lang_name}: {str(e)[:100]}"
+                )
+
+        return task()
+
+    async def _translate_text(self, session, text, source_lang, lang_code, use_cache=True):
+        """翻译一段文本：超长文本按句子切分，各片段并发翻译后按顺序拼接"""
+        pieces = split_segments(text, self.segment_max_chars, source_lang)
+        if len(pieces) == 1:
+            return await self._request_text(session, text, source_lang, lang_code, use_cache)
 
-    @property
-    def key(self) -> str:
-        return self.API_KEY
+        self.metrics['segmented_texts'] += 1
+        self.metrics['segments'] += len(pieces)
+        results = await asyncio.gather(*(
+            self._translate_piece(session, piece, source_lang, lang_code) for piece, _ in pieces
+        ))
+        translated = join_segments(results, [sep for _, sep in pieces], lang_code)
+        if use_cache and self.cache is not None and same_tokens(text, translated):
+            self.cache.put(glossary_namespace(self.glossary, text, source_lang, lang_code), lang_code, text, translated)
+        return translated
 
-    @property
-    def url(self) -> str:
-        return self.API_URL
+    async def _translate_piece(self, session, piece, source_lang, lang_code):
+        """翻译切分出的片段：先查缓存，同一任务中相同片段只请求一次"""
+        key = (piece, lang_code)
+        task = self._piece_tasks.get(key)
+        if task is None:
+            cached = self.cache.get(
+                glossary_namespace(self.glossary, piece, source_lang, lang_code), lang_code, piece
+            ) if self.cache is not None else None
+            if cached is not None:
+                self.metrics['segment_cache_hits'] += 1
+                return cached
+            task = asyncio.ensure_future(self._request_text(session, piece, source_lang, lang_code))
+            self._piece_tasks[key] = task
+        return await asyncio.shield(task)
 
-    @property
-    def workers(self) -> str:
-        return self.MAX_CONCURRENT_REQUESTS
+    async def _request_text(self, session, text, source_lang, lang_code, use_cache=True):
+        """发送一次翻译请求（附带术语约束），成功后写入缓存"""
+        glossary = self._glossary_constraints(text, lang_code)
+        translated = await self._call_translation_api(session, text, source_lang, lang_code, glossary, use_cache)
+        if use_cache and self.cache is not None and translated and same_tokens(text, translated):
+            cache_lang = cache_namespace(source_lang, self.glossary.fingerprint) if glossary else source_lang
+            self.cache.put(cache_lang, lang_code, text, translated)
+        return translated
 
-def get_api_config() -> APIConfig:
-    """获取API配置单例"""
-    return APIConfig()
+    def _glossary_constraints(self, text, lang_code):
+        """内嵌术语约束（无术语表或未命中时为空字符串）"""
+        if self.glossary is None:
+            return ""
+        constraints = self.glossary.constraints(text, lang_code)
+        if constraints:
+            self.metrics['glossary_constrained'] += 1
+        return format_glossary(constraints)
 
+    async def _call_translation_api(self, session, text, source_lang, target_lang, glossary="", use_cache=True):
+        """调用翻译API；配置了本地翻译服务时经服务发送（由服务合并多个实例的相同请求）"""
+        self.metrics['api_requests'] += 1
+        self.metrics['request_chars'] += len(text)
+        if self.daemon_url:
+            return await self._call_daemon(
+                session, text, source_lang, target_lang, glossary,
+                use_cache and self.params.get('use_cache', True)
+            )
+        return await self.api.translate(session, text, source_lang, target_lang, glossary)
 
-import asyncio
-import time
-import aiohttp
-import pandas as pd
-from PyQt5.QtCore import QThread, pyqtSignal
+    async def _connect_daemon(self, session):
+        """检查本地翻译服务是否可用，不可用时直接调用API"""
+        daemon_url = self.api_config.daemon_url
+        if not daemon_url:
+            return None
+        try:
+            async with session.get(f"{daemon_url}/stats", timeout=aiohttp.ClientTimeout(total=3)) as resp:
+                resp.raise_for_status()
+            self.progress_updated.emit(5, f"通过本地翻译服务发送请求: {daemon_url}")
+            return daemon_url
+        except Exception as e:
+            self.progress_updated.emit(5, f"本地翻译服务不可用，直接调用API: {str(e)[:100]}")
+            return None
 
+    async def _call_daemon(self, session, text, source_lang, target_lang, glossary="", use_cache=True):
+        """通过本地翻译服务翻译（由服务统一限流、合并请求和查缓存）
 
-# 定义提取括号内容的函数
-def extract_bracket_text(col_name):
-    match = re.search(r'\((.*?)\)', col_name)  # 正则匹配括号内容
-    return match.group(1) if match else ""     # 返回括号内文本（若无括号则返回空字符串）
+        带术语约束的请求附上术语表指纹，服务按指纹区分缓存；设置了任务时限时超时不超过剩余时间。
+        """
+        payload = {
+            "source_lang": source_lang, "target_lang": target_lang, "text": text, "glossary": glossary,
+            "glossary_fingerprint": self.glossary.fingerprint if glossary else "",
+            "use_cache": use_cache,
+        }
+        timeout = DAEMON_TIMEOUT
+        if self.deadline is not None:
+            timeout = max(1.0, min(timeout, self.deadline - time.time()))
+        try:
+            async with session.post(
+                    f"{self.daemon_url}/translate", json=payload,
+                    timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as resp:
+                data = self.api.codec.loads(decompress_body(await resp.read(), resp.headers.get("Content-Encoding")))
+                if resp.status != 200:
+                    raise ValueError(f"本地翻译服务错误({resp.status}): {data.get('message', '未知错误')}")
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"请求失败: {str(e)}")
+        if data.get("cached"):
+            self.metrics['daemon_cache_hits'] += 1
+        return data.get("text", "")
 
+    def stop(self):
+        """停止翻译任务"""
+        self._is_running = False
 
-class TranslationThread(QThread):
-    """异步翻译线程（支持真正并发）"""
+class CacheImportThread(QThread):
+    """把历史翻译工作簿批量导入翻译缓存（多进程并行解析）"""
     progress_updated = pyqtSignal(int, str)  # (进度百分比, 日志消息)
     finished = pyqtSignal(bool, str)  # (是否成功, 结果消息)
 
-    def __init__(self, params):
+    def __init__(self, folder, source_lang, source_column):
         super().__init__()
-        self.api_config = get_api_config()  # 加载配置
-        self.API_KEY = self.api_config.key
-        self.API_URL = self.api_config.url
-        self.MAX_CONCURRENT_REQUESTS = int(self.api_config.workers)
+        self.folder = folder
+        self.source_lang = source_lang
+        self.source_column = source_column
+        self._is_running = True
+
+    def run(self):
+        try:
+            files = sorted(
+                str(p) for p in Path(self.folder).rglob("*.xlsx") if not p.name.startswith("~$")
+            )
+            if not files:
+                self.finished.emit(False, "目录中没有找到 .xlsx 文件")
+                return
+
+            memory = TranslationMemory(get_api_config().cache_path)
+            imported = duplicates = conflicts = skipped = failed = 0
+            workers = max(1, min(len(files), os.cpu_count() or 1))
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = {pool.submit(scan_translated_workbook, path, self.source_column): path
+                               for path in files}
+                    for done, future in enumerate(as_completed(futures), 1):
+                        path = futures[future]
+                        if not self._is_running:
+                            for f in futures:
+                                f.cancel()
+                            raise Exception("用户取消操作")
+                        try:
+                            pairs, file_skipped = future.result()
+                        except Exception as e:
+                            failed += 1
+                            self.progress_updated.emit(
+                                int(done / len(files) * 100), f"读取失败: {os.path.basename(path)}: {str(e)[:100]}"
+                            )
+                            continue
+                        counts = memory.import_pairs(self.source_lang, pairs)
+                        imported += counts[0]
+                        duplicates += counts[1]
+                        conflicts += counts[2]
+                        skipped += file_skipped
+                        self.progress_updated.emit(
+                            int(done / len(files) * 100),
+                            f"已导入 {done}/{len(files)}: {os.path.basename(path)} | 新增 {counts[0]} | 冲突 {counts[2]}"
+                        )
+            finally:
+                memory.close()
+
+            self.finished.emit(
+                True,
+                f"文件 {len(files)} 个（失败 {failed}）| 导入 {imported} | "
+                f"跳过 {skipped + duplicates}（重复 {duplicates}）| 冲突 {conflicts}"
+            )
+        except Exception as e:
+            self.finished.emit(False, str(e))
+
+    def stop(self):
+        self._is_running = False
+
 
+class WorkbookInspectThread(QThread):
+    """后台读取工作簿的工作表名、表头和行数"""
+    finished = pyqtSignal(str, object)  # (文件路径, SheetInfo 列表或异常)
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def run(self):
+        try:
+            self.finished.emit(self.path, inspect_workbook(self.path))
+        except Exception as e:
+            self.finished.emit(self.path, e)
+
+
+class PreflightThread(QThread):
+    """开始翻译前的快速预估（只读取表头、文本列和所需的附加列）"""
+    finished = pyqtSignal(bool, object)  # (是否成功, 预估结果或错误消息)
+
+    def __init__(self, params):
+        super().__init__()
         self.params = params
-        self._is_running = True
-        self.semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)  # 并发控制
-        self.request_interval = REQUEST_INTERVAL
-        self.last_request_time = 0
-        self.completed_tasks = 0  # 将计数器移到类成员变量
 
     def run(self):
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(self._run_translation())
+            self.finished.emit(True, preflight_estimate(self.params, get_api_config()))
         except Exception as e:
-            self.progress_updated.emit(0, f"严重错误: {str(e)}")
             self.finished.emit(False, str(e))
-        finally:
-            if 'loop' in locals():
-                loop.close()
 
-    async def _run_translation(self):
-        """执行翻译的核心异步函数"""
-        input_path = self.params['input_path']
-        output_path = self.params['output_path']
-        text_column = self.params['text_column']
-        source_lang = self.params['source_lang']
-        target_langs = self.params['target_langs']
 
-        # 1. 读取输入文件
+class TranslationDaemon:
+    """本地翻译服务：同一台机器上的多个程序实例共用接口额度、在途请求合并和翻译缓存
+
+    启动方式: python trans.py daemon。客户端在.env中设置 TRANSLATION_DAEMON_URL 后，
+    翻译请求改为发给本服务，由服务统一限流后调用API。
+    """
+
+    def __init__(self, api_config):
+        self.api = TranslationAPI(api_config)
+        self.cache = TranslationMemory(api_config.cache_path, commit_every=1)  # 客户端可能同时写同一个文件
+        self.inflight = SingleFlight()  # 合并各客户端同时发来的相同请求
+        self.session = None
+        self.started = time.time()
+
+    async def handle_translate(self, request):
+        data = await request.json(loads=self.api.codec.loads)
+        source_lang, target_lang = data["source_lang"], data["target_lang"]
+        text, glossary = data["text"], data.get("glossary", "")
+        fingerprint = data.get("glossary_fingerprint", "") if glossary else ""
+        use_cache = data.get("use_cache", True)
+        self.api.metrics['requests'] += 1
+
+        # 带术语约束的译文按术语表指纹单独缓存，不与无约束的译文混用
+        cache_lang = cache_namespace(source_lang, fingerprint)
+        cached = self.cache.get(cache_lang, target_lang, text) if use_cache else None
+        if cached is not None:
+            self.api.metrics['cache_hits'] += 1
+            return web.json_response({"text": cached, "cached": True})
+
+        async def call():
+            self.api.metrics['api_requests'] += 1
+            return await self.api.translate(self.session, text, source_lang, target_lang, glossary)
+
+        key = (source_lang, target_lang, unicodedata.normalize("NFC", text).strip(), glossary, fingerprint)
         try:
-            df = pd.read_excel(input_path)
-            self.progress_updated.emit(5, f"成功读取文件: {os.path.basename(input_path)}")
+            translated, coalesced = await self.inflight.run(key, call)
         except Exception as e:
-            self.progress_updated.emit(0, f"文件读取失败: {str(e)}")
-            self.finished.emit(False, f"文件错误: {str(e)}")
-            return
+            self.api.metrics['failures'] += 1
+            return web.json_response({"message": str(e)}, status=502)
+        if coalesced:
+            self.api.metrics['coalesced_requests'] += 1
+        elif use_cache and translated and same_tokens(text, translated):
+            try:
+                self.cache.put(cache_lang, target_lang, text, translated)
+            except sqlite3.OperationalError:
+                self.api.metrics['cache_write_errors'] += 1  # 缓存文件被其他进程锁定，本次不缓存
+        return web.json_response({"text": translated})
 
-        # 2. 准备结果DataFrame
-        result_df = df.copy()
-        total_tasks = len(df) * len(target_langs)
-        self.completed_tasks = 0  # 重置计数器
+    async def handle_stats(self, request):
+        return web.json_response({
+            "uptime": time.time() - self.started,
+            "capacity": self.api.capacity,
+            "metrics": dict(self.api.metrics),
+            "endpoints": [
+                {"name": e.name, "outstanding": e.outstanding, "requests": e.requests,
+                 "failures": e.failures, "ejected": e.ejected_until > time.time()}
+                for e in self.api.endpoints.endpoints
+            ],
+        })
 
-        # 3. 创建HTTP会话并执行并发任务
-        async with aiohttp.ClientSession(
-                headers={"Authorization": f"Bearer {self.API_KEY}"},
-                timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
-        ) as session:
-            # 准备所有任务
-            tasks = []
-            for row_idx, row in df.iterrows():
-                text = row[text_column]
-                for lang_code in target_langs:
-                    task = self._create_translation_task(
-                        session, result_df, row_idx, text,
-                        source_lang, lang_code, total_tasks
-                    )
-                    tasks.append(task)
-                    if not self._is_running:
-                        raise Exception("用户取消操作")
+    async def serve(self, host, port):
+        async with self.api.new_session() as session:
+            self.session = session
+            app = web.Application()
+            app.router.add_post("/translate", self.handle_translate)
+            app.router.add_get("/stats", self.handle_stats)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, host, port).start()
+            print(f"本地翻译服务已启动: http://{host}:{port} | 总并发 {self.api.capacity}")
+            try:
+                while True:
+                    await asyncio.sleep(60)
+                    self.cache.commit()
+                    self.api.latency_model.save()
+            finally:
+                await runner.cleanup()
+                self.cache.close()
+                self.api.latency_model.save()
 
-            # 并发执行所有任务
-            await asyncio.gather(*tasks, return_exceptions=True)
 
-        # 4. 保存结果
+def run_daemon(args):
+    """启动本地翻译服务，直到按 Ctrl+C 退出"""
+    api_config = get_api_config()
+    default = urlparse(api_config.daemon_url) if api_config.daemon_url else None
+    host = args.host or (default.hostname if default else None) or "127.0.0.1"
+    port = args.port or (default.port if default else None) or DEFAULT_DAEMON_PORT
+    print(f"加速模式: {describe_fast_path(api_config.fast_path)}")
+    loop = new_event_loop(api_config.fast_path)
+    try:
+        loop.run_until_complete(TranslationDaemon(api_config).serve(host, port))
+    except KeyboardInterrupt:
+        print("本地翻译服务已停止")
+    finally:
+        loop.close()
+
+
+def run_cli(args):
+    """命令行翻译：参数与界面一致，日志输出到终端"""
+    target_langs = [code.upper() for code in split_names(args.langs)] or list(TARGET_LANGUAGES)
+    unknown = [code for code in target_langs if code not in TARGET_LANGUAGES]
+    if unknown:
+        print(f"错误: 不支持的目标语言 {', '.join(unknown)}")
+        return 1
+    output_path = args.output or f"ai_translations_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    text_column = args.column or ("中文" if args.source == "zh" else "英文")
+    params = {
+        'input_path': args.input,
+        'output_path': output_path,
+        'source_lang': args.source,
+        'text_column': text_column,
+        'text_columns': split_names(text_column),
+        'sheets': split_names(args.sheets),
+        'target_langs': target_langs,
+        'low_memory': args.low_memory,
+        'memory_budget_mb': args.memory_budget or get_api_config().memory_budget_mb,
+        'previous_path': args.previous,
+        'key_column': args.key_column or "",
+        'repair': args.repair,
+        'prefilter': not args.no_prefilter,
+        'mask_placeholders': not args.no_mask,
+        'use_cache': not args.no_cache,
+        'glossary_path': args.glossary or get_api_config().glossary_path,
+        'priority_langs': [code.upper() for code in split_names(args.priority_langs)],
+        'trace': args.trace,
+        'profile': args.profile,
+        'deadline_minutes': args.deadline
+    }
+    if args.preflight:
         try:
-            first_col = result_df.columns[0]
-            other_cols = sorted(result_df.columns[1:], key = lambda x: extract_bracket_text(x))
-            
-            result_df = result_df[[first_col] + other_cols]
-            result_df.to_excel(output_path, index=False)
-            self.progress_updated.emit(100, f"翻译完成! 结果已保存到: {os.path.basename(output_path)}")
-            self.finished.emit(True, output_path)
+            est = preflight_estimate(params, get_api_config())
         except Exception as e:
-            self.finished.emit(False, f"文件保存失败: {str(e)}")
+            print(f"预估失败: {str(e)}")
+            return 1
+        for line in format_estimate(est):
+            print(line)
+        if est['skipped_columns']:
+            print(f"以下工作表缺少文本列，已跳过: {', '.join(est['skipped_columns'])}")
+        return 0
+    result = {}
+    thread = TranslationThread(params)
+    # 直接连接：监视线程发出的日志也能立即打印（命令行没有Qt事件循环）
+    thread.progress_updated.connect(lambda value, message: print(f"[{value:3d}%] {message}", flush=True),
+                                    Qt.DirectConnection)
+    thread.finished.connect(lambda success, message: result.update(success=success, message=message))
+    thread.run()  # 直接在当前线程执行
+    if not result.get("success"):
+        print(f"翻译失败: {result.get('message', '')}")
+        return 1
+    return 0
 
-    def _create_translation_task(self, session, result_df, row_idx, text, source_lang, lang_code, total_tasks):
-        """创建单个翻译任务"""
 
-        async def task():
-            lang_name = TARGET_LANGUAGES[lang_code]
+def start_mock_api():
+    """在后台线程启动一个本地模拟翻译接口（立即原样返回原文），返回 (地址, 停止函数)"""
+    ready = threading.Event()
+    state = {}
+
+    async def handle(request):
+        data = await request.json()
+        return web.json_response({"data": {"outputs": {"text": data["inputs"]["query"]}}})
+
+    async def serve():
+        app = web.Application()
+        app.router.add_post("/api", handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        state["url"] = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/api"
+        state["stop"] = asyncio.Event()
+        ready.set()
+        await state["stop"].wait()
+        await runner.cleanup()
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True)
+    thread.start()
+    ready.wait()
+
+    def stop():
+        loop.call_soon_threadsafe(state["stop"].set)
+        thread.join()
+
+    return state["url"], stop
+
+
+def run_benchmark(args):
+    """对比默认模式与加速模式（uvloop + orjson）下请求路径的吞吐量和CPU占用"""
+    api_config = get_api_config()
+    url, stop = start_mock_api()
+    text = "这是一段用于基准测试的产品描述文本，包含若干常见的中文句子。" * 4
+    print(f"模拟接口: {url} | 请求数 {args.requests} | 并发 {args.concurrency} | 原文 {len(text)} 字符")
+
+    def measure(fast):
+        api = TranslationAPI(api_config, endpoints=[(url, "benchmark", args.concurrency, 0.0)], fast=fast)
+        api.hedge.max_ratio = 0  # 基准测试不补发副本
+
+        async def main():
+            async with api.new_session() as session:
+                await asyncio.gather(*(api.translate(session, text, "zh", "EN") for _ in range(args.concurrency)))  # 预热
+                pending = iter(range(args.requests))
+
+                async def worker():
+                    for _ in pending:
+                        await api.translate(session, text, "zh", "EN")
+
+                wall, cpu = time.perf_counter(), time.thread_time()
+                await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+                return time.perf_counter() - wall, time.thread_time() - cpu
+
+        loop = new_event_loop(fast)
+        try:
+            return loop.run_until_complete(main())
+        finally:
+            loop.close()
+
+    try:
+        results = {}
+        for fast in (False, True):
+            wall, cpu = measure(fast)
+            results[fast] = (wall, cpu)
+            label = f"加速 ({describe_fast_path(True)})" if fast else "默认 (asyncio + json)"
+            print(f"{label}: 用时 {wall:.2f}s | {args.requests / wall:.0f} 请求/秒 | "
+                  f"客户端CPU {cpu:.2f}s | 每请求CPU {cpu / args.requests * 1e6:.0f}µs")
+        print(f"加速比: 吞吐量 {results[False][0] / results[True][0]:.2f}x | "
+              f"每请求CPU {results[False][1] / max(results[True][1], 1e-9):.2f}x")
+    finally:
+        stop()
+    return 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Excel多语言翻译工具（不带子命令时启动图形界面）")
+    subparsers = parser.add_subparsers(dest="command")
+
+    daemon = subparsers.add_parser("daemon", help="启动本地翻译服务，供多个实例共用接口额度和缓存")
+    daemon.add_argument("--host", help="监听地址，默认取 TRANSLATION_DAEMON_URL 或 127.0.0.1")
+    daemon.add_argument("--port", type=int, help=f"监听端口，默认取 TRANSLATION_DAEMON_URL 或 {DEFAULT_DAEMON_PORT}")
+
+    bench = subparsers.add_parser("benchmark", help="对比默认模式与加速模式（uvloop + orjson）的请求路径性能")
+    bench.add_argument("-n", "--requests", type=int, default=5000, help="请求数")
+    bench.add_argument("-c", "--concurrency", type=int, default=50, help="并发数")
+
+    cli = subparsers.add_parser("translate", help="命令行翻译Excel文件")
+    cli.add_argument("input", help="输入Excel文件")
+    cli.add_argument("-o", "--output", help="输出文件，默认 ai_translations_时间戳.xlsx")
+    cli.add_argument("-s", "--source", choices=["zh", "en"], default="zh", help="源语言")
+    cli.add_argument("-c", "--column", help="文本列名，多个用逗号分隔")
+    cli.add_argument("-l", "--langs", help="目标语言代码，逗号分隔，默认全部")
+    cli.add_argument("--sheets", help="工作表，多个用逗号分隔，* 表示全部")
+    cli.add_argument("--previous", help="上一版译文文件（增量更新）")
+    cli.add_argument("--key-column", help="增量更新的匹配键列")
+    cli.add_argument("--repair", action="store_true", help="修复模式")
+    cli.add_argument("--glossary", help="术语表文件")
+    cli.add_argument("--priority-langs", help="优先语言代码，逗号分隔")
+    cli.add_argument("--low-memory", action="store_true", help="低内存模式")
+    cli.add_argument("--memory-budget", type=int, help="低内存模式内存预算(MB)")
+    cli.add_argument("--no-prefilter", action="store_true", help="不跳过无需翻译的单元格")
+    cli.add_argument("--no-mask", action="store_true", help="不合并相似文本")
+    cli.add_argument("--no-cache", action="store_true", help="不使用翻译缓存")
+    cli.add_argument("--trace", action="store_true", help="导出请求时间线（Chrome trace 格式）")
+    cli.add_argument("--profile", action="store_true", help="性能分析：保存函数/协程耗时和各阶段内存快照")
+    cli.add_argument("--preflight", action="store_true", help="只预估请求数、字符数和用时，不翻译")
+    cli.add_argument("--deadline", type=float, default=0,
+                     help="任务时限（分钟）：接近时限时停止派发新请求，未翻译的单元格留空，0 表示不限")
+    return parser.parse_args(argv)
+
+
+class Sparkline(QWidget):
+    """简单趋势折线图"""
+
+    def __init__(self, color="#2d7dd2", parent=None):
+        super().__init__(parent)
+        self.values = deque(maxlen=DASHBOARD_HISTORY)
+        self.color = QColor(color)
+        self.setMinimumSize(160, 36)
+
+    def add(self, value):
+        self.values.append(value)
+        self.update()
+
+    def clear(self):
+        self.values.clear()
+        self.update()
+
+    def paintEvent(self, event):
+        if len(self.values) < 2:
+            return
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(self.color, 1.5))
+        w, h = self.width() - 2, self.height() - 2
+        top = max(self.values) or 1
+        step = w / (DASHBOARD_HISTORY - 1)
+        offset = w - step * (len(self.values) - 1)
+        points = [(1 + offset + i * step, 1 + h - h * v / top) for i, v in enumerate(self.values)]
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            painter.drawLine(int(x1), int(y1), int(x2), int(y2))
+        painter.end()
+
+
+class DashboardWidget(QWidget):
+    """翻译仪表盘：按固定间隔读取翻译线程的汇总指标，显示滚动速率、错误率、缓存命中率和预计剩余时间"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        grid = QGridLayout()
+        self.values = {}
+        self.charts = {}
+        rows = [
+            ('cells', "单元格/秒", "#2d7dd2"),
+            ('requests', "请求/秒", "#97cc04"),
+            ('inflight', "进行中", "#f45d01"),
+            ('errors', "错误率", "#d7263d"),
+            ('cache', "缓存命中率", None),
+            ('eta', "预计剩余", None),
+        ]
+        for i, (key, title, color) in enumerate(rows):
+            grid.addWidget(QLabel(title), i, 0)
+            self.values[key] = QLabel("-")
+            self.values[key].setMinimumWidth(120)
+            grid.addWidget(self.values[key], i, 1)
+            if color:
+                self.charts[key] = Sparkline(color)
+                grid.addWidget(self.charts[key], i, 2)
+        grid.setColumnStretch(2, 1)
+        layout = QVBoxLayout()
+        layout.addLayout(grid)
+        layout.addStretch()
+        self.setLayout(layout)
+        self.reset()
+
+    def reset(self):
+        self.samples = deque()
+        self.rate = None
+        for label in self.values.values():
+            label.setText("-")
+        for chart in self.charts.values():
+            chart.clear()
+
+    def update_metrics(self, snap):
+        """加入一次指标快照并刷新显示"""
+        now = snap['elapsed']
+        self.samples.append((now, snap['completed'], snap['failed'], snap['requests']))
+        while len(self.samples) > 2 and now - self.samples[0][0] > DASHBOARD_WINDOW:
+            self.samples.popleft()
+        t0, completed0, failed0, requests0 = self.samples[0]
+        span = now - t0
+        if span <= 0:
+            return
+        cells = (snap['completed'] - completed0) / span
+        requests = (snap['requests'] - requests0) / span
+        done = (snap['completed'] - completed0) + (snap['failed'] - failed0)
+        errors = (snap['failed'] - failed0) / done if done else 0.0
+        lookups = snap['cache_hits'] + snap['requests']
+
+        # 预计剩余时间按平滑后的单元格速率计算，避免随单次波动跳变
+        self.rate = cells if self.rate is None else ETA_EWMA_ALPHA * cells + (1 - ETA_EWMA_ALPHA) * self.rate
+        remaining = snap['total'] - snap['completed'] - snap['failed']
+        if not snap['total']:
+            eta = "-"
+        elif remaining <= 0:
+            eta = "即将完成"
+        elif self.rate > 0:
+            eta = f"{format_duration(remaining / self.rate)}（剩余 {remaining} 个单元格）"
+        else:
+            eta = f"计算中（剩余 {remaining} 个单元格）"
+
+        self.values['cells'].setText(f"{cells:.1f}")
+        self.values['requests'].setText(f"{requests:.1f}")
+        self.values['inflight'].setText(str(snap['inflight']))
+        self.values['errors'].setText(f"{errors:.1%}")
+        self.values['cache'].setText(f"{snap['cache_hits'] / lookups:.1%}" if lookups else "-")
+        self.values['eta'].setText(f"{eta} | 已用 {format_duration(now)}")
+        self.charts['cells'].add(cells)
+        self.charts['requests'].add(requests)
+        self.charts['inflight'].add(snap['inflight'])
+        self.charts['errors'].add(errors)
+
+
+class WorkbookRowSource:
+    """预览数据源：流式读取工作簿中的一个工作表，视图滚动到末尾时再向后读取"""
+
+    def __init__(self, path, sheet=None):
+        self.path = path
+        self.sheet = sheet
+        self.rows = []
+        self.columns = []
+        self._wb = None
+        self._iter = None
+        self.exhausted = False
+        self._open()
+
+    def _open(self):
+        if str(self.path).lower().endswith(".xlsx"):
+            self._wb = openpyxl.load_workbook(self.path, read_only=True)
+            ws = self._wb[self.sheet] if self.sheet else self._wb.worksheets[0]
+            self._iter = iter_sheet_rows(ws)
+            self.columns = next(self._iter, [])
+        else:
+            df = pd.read_excel(self.path, sheet_name=self.sheet or 0)  # .xls 最多 65536 行，直接读取
+            self.columns = [str(c) for c in df.columns]
+            self._iter = df.itertuples(index=False, name=None)
+
+    def row_count(self):
+        return len(self.rows)
+
+    def can_fetch_more(self):
+        return not self.exhausted
+
+    def read_more(self, limit=PREVIEW_BLOCK_ROWS):
+        """向后读取至多 limit 行（不加入 rows，由模型在插入通知之间追加）"""
+        rows = []
+        for row in self._iter:
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+        else:
+            self.close()
+        return rows
+
+    def value(self, row, column):
+        values = self.rows[row]
+        return values[column] if column < len(values) else None
+
+    def find(self, text, start, stop):
+        """在第 start~stop 行中查找，返回 (行, 列) 或 None"""
+        for row in range(start, min(stop, len(self.rows))):
+            for column, value in enumerate(self.rows[row]):
+                if value == text:
+                    return row, column
+        return None
+
+    def refresh(self):
+        return False
+
+    def close(self):
+        self.exhausted = True
+        if self._wb is not None:
+            self._wb.close()  # 及时释放文件句柄，修复模式可能覆盖该文件
+            self._wb = None
+
+
+class JobRowSource:
+    """预览数据源：翻译进行中读取结果存储，按块缓存，定时刷新时在后台线程重新读取
+
+    读取结果存储（低内存模式下为 Parquet 分片）不占用界面线程：块未读到前显示为空，
+    刷新期间继续显示旧内容，读完后通过 on_loaded(首行, 末行) 通知视图重绘。
+    """
+
+    def __init__(self, texts, segments, store, target_langs):
+        self.texts = texts
+        self.segments = segments
+        self.offsets = [seg.offset for seg in segments]
+        self.store = store
+        self.target_langs = target_langs
+        multi = len(segments) > 1
+        self.columns = (["来源"] if multi else []) + ["Excel行", "原文"] + [
+            f"{TARGET_LANGUAGES[code]}({code})" for code in target_langs
+        ]
+        self.exhausted = True
+        self.on_loaded = None
+        self._blocks = {}
+        self._stale = set()  # 已过期、等待后台重新读取的块
+        self._loading = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview")
+
+    def row_count(self):
+        return len(self.texts)
+
+    def can_fetch_more(self):
+        return False
+
+    def _load(self, block):
+        """读取一个块：可能跨越多个文本来源，逐段读取"""
+        start = block * PREVIEW_BLOCK_ROWS
+        stop = min(start + PREVIEW_BLOCK_ROWS, len(self.texts))
+        rows = []
+        pos = start
+        while pos < stop:
+            segment, row_idx = locate_segment(self.segments, self.offsets, pos)
+            count = min(stop - pos, segment.offset + segment.length - pos)
             try:
-                # 执行翻译
-                translated = await self._call_translation_api(
-                    session, text, source_lang, lang_code
+                values = self.store.read_rows(
+                    segment, row_idx, row_idx + count, [target_column(segment, code) for code in self.target_langs]
                 )
+            except Exception:
+                values = [[None] * count for _ in self.target_langs]  # 存储已关闭，下次刷新再读
+            for i in range(count):
+                prefix = [f"{segment.sheet}[{segment.column}]"] if len(self.segments) > 1 else []
+                rows.append(prefix + [row_idx + i + 2, self.texts.iat[pos + i]] + [column[i] for column in values])
+            pos += count
+        with self._lock:
+            self._blocks[block] = rows
+            self._stale.discard(block)
+        return rows
 
-                # 更新结果
-                result_df.at[row_idx, f"{lang_name}({lang_code})"] = translated
+    def _load_in_background(self, block):
+        rows = self._load(block)
+        with self._lock:
+            self._loading.discard(block)
+            on_loaded = self.on_loaded
+        if on_loaded is not None:
+            first = block * PREVIEW_BLOCK_ROWS
+            on_loaded(first, first + len(rows) - 1)
 
-                # 更新进度（使用类成员变量）
-                self.completed_tasks += 1
-                progress = int((self.completed_tasks / total_tasks) * 100)
-                self.progress_updated.emit(
-                    progress,
-                    f"进度: {row_idx + 1}/{len(result_df)}行 | {lang_name} | 已完成: {progress}%"
-                )
-            except Exception as e:
-                result_df.at[row_idx, f"{lang_name}({lang_code})"] = f"[ERROR]"
-                self.progress_updated.emit(
-                    int((self.completed_tasks / total_tasks) * 100),
-                    f"错误: 行{row_idx + 1} {lang_name}: {str(e)[:100]}"
-                )
+    def value(self, row, column):
+        block = row // PREVIEW_BLOCK_ROWS
+        with self._lock:
+            rows = self._blocks.get(block)
+            if (rows is None or block in self._stale) and block not in self._loading:
+                self._loading.add(block)
+                self._executor.submit(self._load_in_background, block)
+        return rows[row % PREVIEW_BLOCK_ROWS][column] if rows is not None else None
 
-        return task()
+    def find(self, text, start, stop):
+        """在第 start~stop 行的译文列中查找，返回 (行, 列) 或 None（由用户操作触发，直接读取）"""
+        first = len(self.columns) - len(self.target_langs)
+        stop = min(stop, len(self.texts))
+        for block in range(start // PREVIEW_BLOCK_ROWS, (stop - 1) // PREVIEW_BLOCK_ROWS + 1):
+            rows = self._load(block)
+            base = block * PREVIEW_BLOCK_ROWS
+            for row in range(max(start, base), min(stop, base + len(rows))):
+                for column in range(first, len(self.columns)):
+                    if rows[row - base][column] == text:
+                        return row, column
+        return None
 
-    async def _call_translation_api(self, session, text, source_lang, target_lang):
-        """调用翻译API（带并发控制和速率限制）"""
-        async with self.semaphore:  # 并发控制
-            # 速率限制
-            elapsed = time.time() - self.last_request_time
-            if elapsed < self.request_interval:
-                await asyncio.sleep(self.request_interval - elapsed)
-
-            self.last_request_time = time.time()
-            
-            if target_lang == 'UK':
-                target_lang = "乌克兰语"
-            
-            payload = {
-                "inputs": {
-                    "source_lang": source_lang,
-                    "target_lang": target_lang,
-                    "query": text
-                },
-                "response_mode": "blocking",
-                "user": "pyqt_translation_tool_thread"
-            }
+    def refresh(self):
+        """标记缓存的块过期，视图重绘时在后台重新读取可见行"""
+        with self._lock:
+            self._stale.update(self._blocks)
+        return True
 
-            try:
-                async with session.post(self.API_URL, json=payload) as resp:
-                    if resp.status != 200:
-                        error = await resp.json()
-                        raise ValueError(f"API错误({resp.status}): {error.get('message', '未知错误')}")
-                    return await self._parse_response(resp)
-            except Exception as e:
-                raise ValueError(f"请求失败: {str(e)}")
+    def close(self):
+        with self._lock:
+            self.on_loaded = None
+            self._blocks.clear()
+        self._executor.shutdown(wait=False)
 
-    async def _parse_response(self, resp):
-        """解析API响应"""
-        data = await resp.json()
-        return data.get("data", {}).get("outputs", {}).get("text", "")
 
-    def stop(self):
-        """停止翻译任务"""
-        self._is_running = False
+class PreviewTableModel(QAbstractTableModel):
+    """虚拟化预览表：只在视图请求时读取可见行，工作簿按需向后流式读取"""
+
+    ERROR_COLOR = QColor("#f8d7da")
+
+    rows_loaded = pyqtSignal(int, int)  # 后台读取完成的行范围
+
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self.source = source
+        if hasattr(source, "on_loaded"):
+            self.rows_loaded.connect(self._rows_loaded)
+            source.on_loaded = self.rows_loaded.emit  # 由后台线程发出，排队到界面线程处理
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.source.row_count()
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.source.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole, Qt.BackgroundRole):
+            return None
+        value = self.source.value(index.row(), index.column())
+        if role == Qt.BackgroundRole:
+            return self.ERROR_COLOR if value == "[ERROR]" else None
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return ""
+        return str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return str(self.source.columns[section]) if section < len(self.source.columns) else None
+        return str(section + 1)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.source.can_fetch_more()
+
+    def fetchMore(self, parent=QModelIndex()):
+        rows = self.source.read_more()
+        if not rows:
+            return
+        first = self.source.row_count()
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.source.rows.extend(rows)
+        self.endInsertRows()
+
+    def _rows_loaded(self, first, last):
+        if self.source.on_loaded is None or first >= self.rowCount():
+            return  # 数据源已关闭
+        last = min(last, self.rowCount() - 1)
+        self.dataChanged.emit(self.index(first, 0), self.index(last, self.columnCount() - 1))
+
+    def refresh(self):
+        """数据源内容有变化时通知视图重绘（视图只会重新读取可见行）"""
+        if self.source.refresh() and self.rowCount():
+            self.dataChanged.emit(self.index(0, 0), self.index(self.rowCount() - 1, self.columnCount() - 1))
+
+    def close(self):
+        self.source.close()
+
 
 class TranslationApp(QMainWindow):
     def __init__(self):
@@ -276,6 +3732,11 @@ class TranslationApp(QMainWindow):
         self.setWindowTitle("多语言文档翻译工具")
         self.setGeometry(100, 100, 800, 600)
         self.thread = None
+        self.import_thread = None
+        # 预估、预读线程发出结果后才释放引用，避免线程仍在运行时被销毁
+        self.preflight_threads = []
+        self.inspect_threads = []
+        self.workbook_info = None  # 输入文件的工作表和表头（SheetInfo 列表）
         self.init_ui()
 
     def init_ui(self):
@@ -291,6 +3752,7 @@ class TranslationApp(QMainWindow):
         self.input_label = QLabel("输入文件路径:")
         self.input_path = QLineEdit()
         self.input_path.setPlaceholderText("请选择Excel文件...")
+        self.input_path.editingFinished.connect(self.inspect_input_file)
         input_btn = QPushButton("浏览...")
         input_btn.clicked.connect(self.select_input_file)
         input_layout.addWidget(self.input_label)
@@ -310,6 +3772,41 @@ class TranslationApp(QMainWindow):
         output_layout.addWidget(output_btn)
         file_layout.addLayout(output_layout)
 
+        # 上一版译文（增量更新）
+        previous_layout = QHBoxLayout()
+        self.previous_label = QLabel("上一版译文:")
+        self.previous_path = QLineEdit()
+        self.previous_path.setPlaceholderText("可选: 选择上次生成的翻译结果，仅翻译新增/变更的行")
+        previous_btn = QPushButton("浏览...")
+        previous_btn.clicked.connect(self.select_previous_file)
+        previous_layout.addWidget(self.previous_label)
+        previous_layout.addWidget(self.previous_path)
+        previous_layout.addWidget(previous_btn)
+        file_layout.addLayout(previous_layout)
+
+        # 术语表
+        glossary_layout = QHBoxLayout()
+        self.glossary_label = QLabel("术语表:")
+        self.glossary_path = QLineEdit(self.default_glossary_path())
+        self.glossary_path.setPlaceholderText("可选: CSV/Excel，首列为原文，其余列为 名称(代码) 译文")
+        glossary_btn = QPushButton("浏览...")
+        glossary_btn.clicked.connect(self.select_glossary_file)
+        glossary_layout.addWidget(self.glossary_label)
+        glossary_layout.addWidget(self.glossary_path)
+        glossary_layout.addWidget(glossary_btn)
+        file_layout.addLayout(glossary_layout)
+
+        # 修复模式
+        repair_layout = QHBoxLayout()
+        self.repair_cb = QCheckBox("修复模式：输入为已翻译文件，仅重译 [ERROR] 和空白单元格")
+        self.overwrite_cb = QCheckBox("覆盖原文件")
+        self.overwrite_cb.setEnabled(False)
+        self.repair_cb.toggled.connect(self.overwrite_cb.setEnabled)
+        repair_layout.addWidget(self.repair_cb)
+        repair_layout.addWidget(self.overwrite_cb)
+        repair_layout.addStretch()
+        file_layout.addLayout(repair_layout)
+
         file_group.setLayout(file_layout)
         layout.addWidget(file_group)
 
@@ -334,12 +3831,67 @@ class TranslationApp(QMainWindow):
 
         # 文本列设置
         column_layout = QHBoxLayout()
+        self.sheet_label = QLabel("工作表:")
+        self.sheet_names = QComboBox()
+        self.sheet_names.setEditable(True)
+        self.sheet_names.lineEdit().setPlaceholderText("默认第一个，多个用逗号分隔，* 表示全部")
+        self.sheet_names.currentTextChanged.connect(self.update_column_choices)
+        column_layout.addWidget(self.sheet_label)
+        column_layout.addWidget(self.sheet_names, 1)
         self.column_label = QLabel("文本列名:")
-        self.text_column = QLineEdit("中文")
+        self.text_column = QComboBox()
+        self.text_column.setEditable(True)
+        self.text_column.setEditText("中文")
+        self.text_column.setToolTip("选择输入文件后可从下拉列表选择；多个文本列用逗号分隔")
         column_layout.addWidget(self.column_label)
-        column_layout.addWidget(self.text_column)
+        column_layout.addWidget(self.text_column, 1)
+        self.key_column_label = QLabel("匹配键列:")
+        self.key_column = QLineEdit()
+        self.key_column.setPlaceholderText("可选，留空则按原文匹配")
+        column_layout.addWidget(self.key_column_label)
+        column_layout.addWidget(self.key_column)
         settings_layout.addLayout(column_layout)
 
+        # 低内存模式设置
+        memory_layout = QHBoxLayout()
+        self.low_memory_cb = QCheckBox("低内存模式（超大文件，结果溢写到磁盘）")
+        self.memory_budget_label = QLabel("内存预算(MB):")
+        self.memory_budget = QSpinBox()
+        self.memory_budget.setRange(64, 65536)
+        self.memory_budget.setValue(self.default_memory_budget())
+        self.prefilter_cb = QCheckBox("跳过无需翻译的单元格")
+        self.prefilter_cb.setToolTip("空值、纯数字、编号/SKU、链接、邮箱、已是目标语言文字的单元格不调用API")
+        self.prefilter_cb.setChecked(True)
+        memory_layout.addWidget(self.prefilter_cb)
+        self.mask_cb = QCheckBox("合并相似文本")
+        self.mask_cb.setToolTip("数字、编号和 {var} 占位符替换为标记后去重翻译，再还原到各行")
+        self.mask_cb.setChecked(True)
+        self.cache_cb = QCheckBox("使用翻译缓存")
+        self.cache_cb.setChecked(True)
+        memory_layout.addWidget(self.mask_cb)
+        memory_layout.addWidget(self.cache_cb)
+        self.trace_cb = QCheckBox("记录请求时间线")
+        self.trace_cb.setToolTip("导出 Chrome trace 格式的请求时间线（输出文件名_trace.json），用于分析并发瓶颈")
+        memory_layout.addWidget(self.trace_cb)
+        self.profile_cb = QCheckBox("性能分析")
+        self.profile_cb.setToolTip("记录函数与协程耗时、各阶段内存快照，保存为 输出文件名_profile.prof/.txt，反馈性能问题时请附上")
+        memory_layout.addWidget(self.profile_cb)
+        self.import_btn = QPushButton("导入历史译文...")
+        self.import_btn.setToolTip("扫描目录中已翻译的工作簿，把译文导入翻译缓存")
+        self.import_btn.clicked.connect(self.import_translation_cache)
+        memory_layout.addWidget(self.import_btn)
+        memory_layout.addWidget(self.low_memory_cb)
+        memory_layout.addStretch()
+        memory_layout.addWidget(QLabel("任务时限(分钟):"))
+        self.deadline_minutes = QSpinBox()
+        self.deadline_minutes.setRange(0, 1440)
+        self.deadline_minutes.setSpecialValueText("不限")
+        self.deadline_minutes.setToolTip("接近时限时停止派发新请求并保存已完成的译文，未翻译的单元格留空，可稍后用修复模式补译")
+        memory_layout.addWidget(self.deadline_minutes)
+        memory_layout.addWidget(self.memory_budget_label)
+        memory_layout.addWidget(self.memory_budget)
+        settings_layout.addLayout(memory_layout)
+
         # 目标语言选择
         lang_group = QGroupBox("目标语言 (默认全选)")
         lang_grid = QVBoxLayout()
@@ -352,6 +3904,11 @@ class TranslationApp(QMainWindow):
         deselect_all_btn.clicked.connect(self.deselect_all_languages)
         select_buttons.addWidget(select_all_btn)
         select_buttons.addWidget(deselect_all_btn)
+        self.priority_label = QLabel("优先语言:")
+        self.priority_langs = QLineEdit(self.default_priority_langs())
+        self.priority_langs.setPlaceholderText("可选，语言代码如 EN,JA，优先完成并提前保存")
+        select_buttons.addWidget(self.priority_label)
+        select_buttons.addWidget(self.priority_langs)
         lang_grid.addLayout(select_buttons)
 
         # 语言复选框（两列布局）
@@ -396,8 +3953,46 @@ class TranslationApp(QMainWindow):
         self.log_display.setReadOnly(True)
         self.log_display.setPlaceholderText("翻译日志将显示在这里...")
 
+        # 仪表盘：定时读取翻译线程的汇总指标，不经过逐条的进度信号
+        self.dashboard = DashboardWidget()
+        self.dashboard_timer = QTimer(self)
+        self.dashboard_timer.setInterval(DASHBOARD_INTERVAL_MS)
+        self.dashboard_timer.timeout.connect(self.refresh_dashboard)
+
+        # 预览：虚拟化表格，只读取可见行；翻译中显示实时结果，完成后显示输出文件
+        self.preview_page = QWidget()
+        preview_layout = QVBoxLayout()
+        preview_bar = QHBoxLayout()
+        preview_bar.addWidget(QLabel("工作表:"))
+        self.preview_sheet = QComboBox()
+        self.preview_sheet.setMinimumWidth(120)
+        self.preview_sheet.currentTextChanged.connect(lambda _: self.load_preview())
+        preview_bar.addWidget(self.preview_sheet)
+        self.preview_label = QLabel("选择输入文件后可在此预览")
+        preview_bar.addWidget(self.preview_label, 1)
+        self.next_error_btn = QPushButton("下一个 [ERROR]")
+        self.next_error_btn.clicked.connect(self.find_next_error)
+        preview_bar.addWidget(self.next_error_btn)
+        self.preview_view = QTableView()
+        self.preview_view.setWordWrap(False)
+        self.preview_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.preview_view.verticalHeader().setDefaultSectionSize(22)
+        self.preview_view.horizontalHeader().setDefaultSectionSize(180)
+        preview_layout.addLayout(preview_bar)
+        preview_layout.addWidget(self.preview_view)
+        self.preview_page.setLayout(preview_layout)
+        self.preview_model = None
+        self.preview_path = None
+        self.preview_key = None  # 当前预览的 (文件, 工作表)，避免重复加载
+
+        self.progress_tabs = QTabWidget()
+        self.progress_tabs.addTab(self.log_display, "日志")
+        self.progress_tabs.addTab(self.dashboard, "仪表盘")
+        self.progress_tabs.addTab(self.preview_page, "预览")
+        self.progress_tabs.currentChanged.connect(lambda _: self.load_preview())
+
         progress_layout.addWidget(self.progress_bar)
-        progress_layout.addWidget(self.log_display)
+        progress_layout.addWidget(self.progress_tabs)
         progress_group.setLayout(progress_layout)
         layout.addWidget(progress_group)
 
@@ -405,9 +4000,13 @@ class TranslationApp(QMainWindow):
         btn_layout = QHBoxLayout()
         self.translate_btn = QPushButton("开始翻译")
         self.translate_btn.clicked.connect(self.start_translation)
+        self.preflight_btn = QPushButton("预估")
+        self.preflight_btn.setToolTip("只读取文本列，按预过滤、相似文本合并、翻译缓存和历史耗时预估请求数、字符数和用时")
+        self.preflight_btn.clicked.connect(self.start_preflight)
         self.cancel_btn = QPushButton("取消")
         self.cancel_btn.clicked.connect(self.cancel_translation)
         self.cancel_btn.setEnabled(False)
+        btn_layout.addWidget(self.preflight_btn)
         btn_layout.addWidget(self.translate_btn)
         btn_layout.addWidget(self.cancel_btn)
         layout.addLayout(btn_layout)
@@ -415,12 +4014,101 @@ class TranslationApp(QMainWindow):
         main_widget.setLayout(layout)
         self.setCentralWidget(main_widget)
 
+    @staticmethod
+    def default_memory_budget():
+        """读取.env中的内存预算，配置缺失时使用默认值"""
+        try:
+            return get_api_config().memory_budget_mb
+        except Exception:
+            return DEFAULT_MEMORY_BUDGET_MB
+
+    @staticmethod
+    def default_glossary_path():
+        """读取.env中的默认术语表路径"""
+        try:
+            return get_api_config().glossary_path
+        except Exception:
+            return ""
+
+    @staticmethod
+    def default_priority_langs():
+        """读取.env中的默认优先语言"""
+        try:
+            return get_api_config().priority_langs
+        except Exception:
+            return ""
+
     def select_input_file(self):
         path, _ = QFileDialog.getOpenFileName(
             self, "选择Excel文件", "", "Excel文件 (*.xlsx *.xls)"
         )
         if path:
             self.input_path.setText(path)
+            self.inspect_input_file()
+
+    def inspect_input_file(self):
+        """后台读取输入文件的工作表名和表头，填充下拉列表"""
+        path = self.input_path.text()
+        if not path or not os.path.isfile(path):
+            return
+        thread = WorkbookInspectThread(path)
+        thread.finished.connect(self.inspect_finished)
+        self.inspect_threads.append(thread)  # 之前的预读可能仍在运行，各自保留到结束
+        thread.start()
+
+    def release_worker(self, thread, workers):
+        """工作线程已发出结果：等待其 run() 返回后释放（结果是 run() 的最后一步，等待很短）"""
+        thread.wait()
+        workers.remove(thread)
+        thread.deleteLater()
+
+    def inspect_finished(self, path, info):
+        """工作簿预读完成：更新工作表和文本列下拉列表"""
+        self.release_worker(self.sender(), self.inspect_threads)
+        if path != self.input_path.text():
+            return  # 期间又选择了其他文件，丢弃旧文件的结果
+        if isinstance(info, Exception):
+            self.workbook_info = None
+            self.log_message(f"无法预读工作簿结构: {str(info)}")
+            return
+        self.workbook_info = info
+        if self.thread is None:
+            self.set_preview_file(path)
+        sheet_text = self.sheet_names.currentText()
+        self.sheet_names.blockSignals(True)
+        self.sheet_names.clear()
+        for sheet in info:
+            self.sheet_names.addItem(sheet.name)
+            if sheet.rows is not None:
+                self.sheet_names.setItemData(self.sheet_names.count() - 1, f"约 {sheet.rows} 行", Qt.ToolTipRole)
+        if len(info) > 1:
+            self.sheet_names.addItem("*")
+            self.sheet_names.setItemData(self.sheet_names.count() - 1, "全部工作表", Qt.ToolTipRole)
+        self.sheet_names.setEditText(sheet_text)
+        self.sheet_names.blockSignals(False)
+        self.log_message("工作表: " + " | ".join(
+            f"{sheet.name} ({'?' if sheet.rows is None else sheet.rows}行, {len(sheet.columns)}列)" for sheet in info
+        ))
+        columns = self.update_column_choices()
+        missing = [c for c in split_names(self.text_column.currentText()) if c not in columns]
+        if missing:
+            self.log_message(f"提示: 所选工作表中没有列 {', '.join(missing)}，可选列: {', '.join(columns) or '无'}")
+
+    def update_column_choices(self):
+        """按当前选择的工作表更新文本列下拉列表，返回可选列"""
+        info = self.workbook_info
+        if not info:
+            return []
+        try:
+            selected = select_sheets([sheet.name for sheet in info], split_names(self.sheet_names.currentText()))
+        except ValueError:
+            return []  # 正在输入工作表名
+        columns = list(dict.fromkeys(c for sheet in info if sheet.name in selected for c in sheet.columns))
+        column_text = self.text_column.currentText()
+        self.text_column.clear()
+        self.text_column.addItems(columns)
+        self.text_column.setEditText(column_text)
+        return columns
 
     def select_output_file(self):
         path, _ = QFileDialog.getSaveFileName(
@@ -429,12 +4117,26 @@ class TranslationApp(QMainWindow):
         if path:
             self.output_path.setText(path)
 
+    def select_previous_file(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "选择上一版翻译结果", "", "Excel文件 (*.xlsx *.xls)"
+        )
+        if path:
+            self.previous_path.setText(path)
+
+    def select_glossary_file(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "选择术语表", "", "术语表 (*.csv *.xlsx *.xls)"
+        )
+        if path:
+            self.glossary_path.setText(path)
+
     def update_text_column(self):
         """根据源语言自动设置默认列名"""
         if self.zh_radio.isChecked():
-            self.text_column.setText("中文")
+            self.text_column.setEditText("中文")
         else:
-            self.text_column.setText("英文")
+            self.text_column.setEditText("英文")
 
     def select_all_languages(self):
         """全选所有目标语言"""
@@ -454,45 +4156,177 @@ class TranslationApp(QMainWindow):
         self.log_display.append(f"[{timestamp}] {message}")
         self.log_display.ensureCursorVisible()
 
+    def refresh_dashboard(self):
+        """定时刷新仪表盘和预览"""
+        if self.thread is not None:
+            self.dashboard.update_metrics(self.thread.metrics_snapshot())
+            if self.preview_model is not None and self.progress_tabs.currentWidget() is self.preview_page:
+                self.preview_model.refresh()
+            else:
+                self.load_preview()
+
+    def set_preview_source(self, source, description):
+        """切换预览数据源，释放上一个数据源占用的文件"""
+        if self.preview_model is not None:
+            self.preview_model.close()
+        self.preview_model = PreviewTableModel(source, self) if source is not None else None
+        self.preview_view.setModel(self.preview_model)
+        self.preview_label.setText(description)
+
+    def set_preview_file(self, path):
+        """预览指定工作簿：列出工作表，页面可见时再读取数据"""
+        self.preview_path = path
+        self.preview_key = None
+        try:
+            sheets = [sheet.name for sheet in inspect_workbook(path)]
+        except Exception:
+            sheets = []
+        self.preview_sheet.blockSignals(True)
+        self.preview_sheet.clear()
+        self.preview_sheet.addItems(sheets)
+        self.preview_sheet.blockSignals(False)
+        self.load_preview()
+
+    def load_preview(self):
+        """预览页可见时加载数据：翻译中显示实时结果，否则显示输出或输入文件"""
+        if self.progress_tabs.currentWidget() is not self.preview_page:
+            return
+        if self.thread is not None:
+            self.preview_sheet.setEnabled(False)
+            preview = self.thread.preview
+            if preview is not None and not isinstance(getattr(self.preview_model, 'source', None), JobRowSource):
+                self.set_preview_source(JobRowSource(*preview), "翻译中: 实时结果（每秒刷新）")
+            return
+        self.preview_sheet.setEnabled(True)
+        key = (self.preview_path, self.preview_sheet.currentText())
+        if not self.preview_path or key == self.preview_key:
+            return
+        self.preview_key = key
+        try:
+            source = WorkbookRowSource(self.preview_path, self.preview_sheet.currentText() or None)
+        except Exception as e:
+            self.set_preview_source(None, f"无法预览: {str(e)}")
+            return
+        self.set_preview_source(source, os.path.basename(self.preview_path))
+
+    def find_next_error(self):
+        """从当前选中行之后查找下一个 [ERROR] 单元格"""
+        if self.preview_model is not None:
+            self._search_error(self.preview_model, self.preview_view.currentIndex().row() + 1)
+
+    def _search_error(self, model, start):
+        """分批查找，每批之间返回事件循环，保持界面响应"""
+        if model is not self.preview_model:
+            return  # 数据源已切换
+        source = model.source
+        stop = start + PREVIEW_SEARCH_ROWS
+        while source.row_count() < stop and model.canFetchMore():
+            model.fetchMore()  # 工作簿数据源按需向后读取
+        hit = source.find("[ERROR]", start, stop)
+        if hit is not None:
+            index = model.index(*hit)
+            self.preview_view.setCurrentIndex(index)
+            self.preview_view.scrollTo(index, QTableView.PositionAtCenter)
+            return
+        if stop >= source.row_count():
+            self.preview_label.setText("之后没有 [ERROR] 单元格")
+            return
+        QTimer.singleShot(0, lambda: self._search_error(model, stop))
+
     def update_progress(self, value, message):
         """更新进度条和日志"""
         self.progress_bar.setValue(value)
         if message:
             self.log_message(message)
 
-    def start_translation(self):
-        """开始翻译任务"""
+    def collect_params(self):
+        """校验界面输入并整理任务参数，输入有误时记录错误并返回 None"""
         # 1. 验证输入
         input_path = self.input_path.text()
         if not input_path or not os.path.exists(input_path):
             self.log_message("错误: 请选择有效的输入文件路径")
-            return
+            return None
 
         # 2. 获取输出路径
-        if self.output_path.text():
+        repair = self.repair_cb.isChecked()
+        if repair and self.overwrite_cb.isChecked():
+            output_path = input_path
+        elif self.output_path.text():
             output_path = self.output_path.text()
         else:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_path = f"ai_translations_{timestamp}.xlsx"
 
+        previous_path = self.previous_path.text()
+        if previous_path and not os.path.exists(previous_path):
+            self.log_message("错误: 上一版译文文件不存在")
+            return None
+
+        glossary_path = self.glossary_path.text()
+        if glossary_path and not os.path.exists(glossary_path):
+            self.log_message("错误: 术语表文件不存在")
+            return None
+
         # 3. 获取翻译设置
         source_lang = "zh" if self.zh_radio.isChecked() else "en"
-        text_column = self.text_column.text()
+        text_column = self.text_column.currentText()
+        sheets = split_names(self.sheet_names.currentText())
         target_langs = [code for code, cb in self.lang_checkboxes.items() if cb.isChecked()]
 
         if not target_langs:
             self.log_message("错误: 请至少选择一种目标语言")
-            return
+            return None
+
+        # 只读表头检查工作表和文本列，避免读取整个文件后才发现列名错误
+        try:
+            info = inspect_workbook(input_path)
+        except Exception:
+            info = None  # 无法预读时交给翻译线程报告
+        if info is not None:
+            try:
+                selected = select_sheets([sheet.name for sheet in info], sheets)
+                build_segments(
+                    {sheet.name: (set(sheet.columns), sheet.rows or 0) for sheet in info if sheet.name in selected},
+                    split_names(text_column)
+                )
+            except ValueError as e:
+                self.log_message(f"错误: {str(e)}")
+                return None
 
         # 4. 准备参数
-        params = {
+        return {
             'input_path': input_path,
             'output_path': output_path,
             'source_lang': source_lang,
             'text_column': text_column,
-            'target_langs': target_langs
+            'text_columns': split_names(text_column),
+            'sheets': sheets,
+            'target_langs': target_langs,
+            'low_memory': self.low_memory_cb.isChecked(),
+            'memory_budget_mb': self.memory_budget.value(),
+            'previous_path': previous_path,
+            'key_column': self.key_column.text().strip(),
+            'repair': repair,
+            'prefilter': self.prefilter_cb.isChecked(),
+            'mask_placeholders': self.mask_cb.isChecked(),
+            'use_cache': self.cache_cb.isChecked(),
+            'glossary_path': glossary_path,
+            'priority_langs': [code.upper() for code in split_names(self.priority_langs.text())],
+            'trace': self.trace_cb.isChecked(),
+            'profile': self.profile_cb.isChecked(),
+            'deadline_minutes': self.deadline_minutes.value()
         }
 
+    def start_translation(self):
+        """开始翻译任务"""
+        params = self.collect_params()
+        if params is None:
+            return
+        input_path, output_path = params['input_path'], params['output_path']
+        source_lang, target_langs = params['source_lang'], params['target_langs']
+        text_column, sheets = params['text_column'], params['sheets']
+        repair, previous_path, glossary_path = params['repair'], params['previous_path'], params['glossary_path']
+
         # 5. 禁用UI控件
         self.set_ui_enabled(False)
         self.progress_bar.setValue(0)
@@ -501,13 +4335,77 @@ class TranslationApp(QMainWindow):
         self.log_message(f"源语言: {source_lang}")
         self.log_message(f"目标语言: {', '.join([TARGET_LANGUAGES[code] for code in target_langs])}")
         self.log_message(f"文本列: {text_column}")
+        if sheets:
+            self.log_message(f"工作表: {', '.join(sheets)}")
         self.log_message(f"输出文件: {os.path.basename(output_path)}")
+        if repair:
+            self.log_message("修复模式: 仅重译 [ERROR] 和空白单元格" + ("（覆盖原文件）" if output_path == input_path else ""))
+        if previous_path:
+            self.log_message(f"增量更新: 基于 {os.path.basename(previous_path)}，匹配列: {params['key_column'] or text_column}")
+        if glossary_path:
+            self.log_message(f"术语表: {os.path.basename(glossary_path)}")
+        if params['priority_langs']:
+            self.log_message(f"优先语言: {', '.join(params['priority_langs'])}")
+        if params['low_memory']:
+            self.log_message(f"低内存模式: 内存预算 {params['memory_budget_mb']} MB")
 
         # 6. 启动翻译线程
         self.thread = TranslationThread(params)
         self.thread.progress_updated.connect(self.update_progress)
         self.thread.finished.connect(self.translation_finished)
+        self.dashboard.reset()
+        self.set_preview_source(None, "等待读取输入文件...")
+        self.preview_key = None
         self.thread.start()
+        self.dashboard_timer.start()
+
+    def start_preflight(self):
+        """不开始翻译，只预估请求数、字符数和用时"""
+        params = self.collect_params()
+        if params is None:
+            return
+        self.preflight_btn.setEnabled(False)
+        self.log_message(f"=== 预估: {os.path.basename(params['input_path'])} ===")
+        thread = PreflightThread(params)
+        thread.finished.connect(self.preflight_finished)
+        self.preflight_threads.append(thread)
+        thread.start()
+
+    def preflight_finished(self, success, result):
+        """显示预估结果"""
+        self.release_worker(self.sender(), self.preflight_threads)
+        self.preflight_btn.setEnabled(self.thread is None and self.import_thread is None)
+        if not success:
+            self.log_message(f"✖ 预估失败: {result}")
+            return
+        for line in format_estimate(result):
+            self.log_message(line)
+        if result['skipped_columns']:
+            self.log_message(f"以下工作表缺少文本列，已跳过: {', '.join(result['skipped_columns'])}")
+
+    def import_translation_cache(self):
+        """选择目录并把历史翻译结果导入翻译缓存"""
+        folder = QFileDialog.getExistingDirectory(self, "选择历史译文所在目录")
+        if not folder:
+            return
+        source_lang = "zh" if self.zh_radio.isChecked() else "en"
+        self.set_ui_enabled(False)
+        self.progress_bar.setValue(0)
+        self.log_message(f"=== 开始导入历史译文: {folder} ===")
+
+        self.import_thread = CacheImportThread(folder, source_lang, self.text_column.currentText())
+        self.import_thread.progress_updated.connect(self.update_progress)
+        self.import_thread.finished.connect(self.import_finished)
+        self.import_thread.start()
+
+    def import_finished(self, success, message):
+        """历史译文导入完成"""
+        self.set_ui_enabled(True)
+        if success:
+            self.log_message(f"✔ 导入完成: {message}")
+        else:
+            self.log_message(f"✖ 导入失败: {message}")
+        self.import_thread = None
 
     def set_ui_enabled(self, enabled):
         """设置UI控件的启用状态"""
@@ -516,13 +4414,35 @@ class TranslationApp(QMainWindow):
         self.zh_radio.setEnabled(enabled)
         self.en_radio.setEnabled(enabled)
         self.text_column.setEnabled(enabled)
+        self.sheet_names.setEnabled(enabled)
+        self.previous_path.setEnabled(enabled)
+        self.glossary_path.setEnabled(enabled)
+        self.key_column.setEnabled(enabled)
+        self.repair_cb.setEnabled(enabled)
+        self.overwrite_cb.setEnabled(enabled and self.repair_cb.isChecked())
+        self.prefilter_cb.setEnabled(enabled)
+        self.mask_cb.setEnabled(enabled)
+        self.cache_cb.setEnabled(enabled)
+        self.trace_cb.setEnabled(enabled)
+        self.profile_cb.setEnabled(enabled)
+        self.import_btn.setEnabled(enabled)
+        self.low_memory_cb.setEnabled(enabled)
+        self.memory_budget.setEnabled(enabled)
+        self.deadline_minutes.setEnabled(enabled)
         for cb in self.lang_checkboxes.values():
             cb.setEnabled(enabled)
+        self.priority_langs.setEnabled(enabled)
         self.translate_btn.setEnabled(enabled)
+        self.preflight_btn.setEnabled(enabled and not self.preflight_threads)  # 同一时间只运行一个预估
         self.cancel_btn.setEnabled(not enabled)
 
     def cancel_translation(self):
-        """取消当前翻译任务"""
+        """取消当前翻译任务或历史译文导入"""
+        if self.import_thread is not None and self.import_thread.isRunning():
+            self.import_thread.stop()  # 当前文件解析完成后停止，已导入的部分保留
+            self.cancel_btn.setEnabled(False)
+            self.log_message("警告: 用户请求取消导入...")
+            return
         if self.thread and self.thread.isRunning():
             self.thread.stop()
             self.log_message("警告: 用户请求取消翻译...")
@@ -532,6 +4452,11 @@ class TranslationApp(QMainWindow):
 
     def translation_finished(self, success, message):
         """翻译完成后的处理"""
+        self.dashboard_timer.stop()
+        if self.thread is not None:
+            self.refresh_dashboard()
+        output_path = self.thread.params['output_path'] if self.thread is not None else None
+        self.set_preview_source(None, "")
         self.set_ui_enabled(True)
         if success:
             self.log_message(f"✔ 翻译成功: {message}")
@@ -539,9 +4464,18 @@ class TranslationApp(QMainWindow):
             self.log_message(f"✖ 翻译失败: {message}")
         self.log_message("=== 翻译任务结束 ===")
         self.thread = None
+        if success and output_path and os.path.exists(output_path):
+            self.set_preview_file(output_path)
+        elif self.input_path.text():
+            self.set_preview_file(self.input_path.text())
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包后多进程导入缓存需要
+    if len(sys.argv) > 1 and sys.argv[1] in ("daemon", "translate", "benchmark", "-h", "--help"):
+        args = parse_args(sys.argv[1:])
+        commands = {"daemon": run_daemon, "translate": run_cli, "benchmark": run_benchmark}
+        sys.exit(commands[args.command](args))
     app = QApplication(sys.argv)
     app.setWindowIcon(QIcon('favicon.ico'))
     window = TranslationApp()